@@ -1,31 +1,21 @@
-import os, json
-from datetime import datetime
 from agents.summary_agent import gemini_generate  # same AI function used before
+from tools.llm_client import llm_client
+from agents.chat_context import chat_context
+from tools.patient_store import patient_store
+from tools.tracing import tracer
 
 class ChatAgent:
-    def __init__(self, chat_dir="memory/chat"):
-        self.chat_dir = chat_dir
-        os.makedirs(chat_dir, exist_ok=True)
-
-    def _get_chat_file(self, user):
-        return os.path.join(self.chat_dir, f"{user}.json")
-
-    def load_history(self, user):
-        path = self._get_chat_file(user)
-        if not os.path.exists(path):
-            return []
-        return json.load(open(path))
-
-    def save_history(self, user, history):
-        path = self._get_chat_file(user)
-        json.dump(history, open(path, "w"), indent=2)
+    def load_history(self, user, limit=None):
+        return patient_store.load_chat(user, limit)
 
     def generate_reply(self, prompt):
         # Try Gemini if key is available
         reply = gemini_generate(prompt, language="en")
         if reply:
             return reply
+        return self.fallback_reply(prompt)
 
+    def fallback_reply(self, prompt):
         # fallback — rule based (simple)
         prompt_l = prompt.lower()
 
@@ -37,31 +27,53 @@ class ChatAgent:
             return "Please describe your symptoms clearly (e.g., fatigue + dizziness)."
         return "I am here to help. Please ask about your reports, tests or symptoms."
 
-    def run(self, user, message):
-        # load past chats
-        history = self.load_history(user)
+    @tracer.traced("chat")
+    def run(self, user, message, context=None):
+        # report context is stored once per conversation, not in every message
+        if context is not None:
+            chat_context.set_context(user, context)
 
         # append new user message
-        history.append({
-            "role": "user",
-            "message": message,
-            "time": datetime.utcnow().isoformat()
-        })
+        patient_store.append_chat(user, "user", message)
 
-        # create prompt for Gemini
-        prompt = "\n".join(
-            [f'{h["role"]}: {h["message"]}' for h in history[-6:]]  # last 6 messages
-        )
+        # context + retrieved history + rolling summary + recent turns, within the token budget
+        prompt = chat_context.build_prompt(user, query=message)
 
         reply = self.generate_reply(prompt)
 
         # save assistant reply
-        history.append({
-            "role": "assistant",
-            "message": reply,
-            "time": datetime.utcnow().isoformat()
-        })
-
-        self.save_history(user, history)
+        patient_store.append_chat(user, "assistant", reply)
 
         return reply
+
+    def stream(self, user, message, context=None, cancel=None):
+        """Like run(), but yields the reply in chunks as Gemini streams it.
+
+        `cancel` is an optional threading.Event; setting it (or closing the
+        generator, e.g. Streamlit's Stop) ends the answer early. Whatever
+        was produced so far is saved to the chat history.
+        """
+        # not made current: the answer is yielded to the caller chunk by chunk
+        span = tracer.start_span("chat", user=user, streamed=True)
+        with tracer.span("chat.setup", parent=span):
+            if context is not None:
+                chat_context.set_context(user, context)
+            patient_store.append_chat(user, "user", message)
+            prompt = chat_context.build_prompt(user, query=message)
+
+        chunks = []
+        stream = tracer.iter_span("llm.stream", llm_client.stream(prompt), parent=span)
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+                if cancel is not None and cancel.is_set():
+                    break
+            if not chunks:
+                chunks.append(self.fallback_reply(prompt))
+                yield chunks[0]
+        finally:
+            stream.close()  # releases the client's concurrency slot right away
+            patient_store.append_chat(user, "assistant", "".join(chunks))
+            span.set(reply_chars=sum(map(len, chunks)))
+            span.finish()
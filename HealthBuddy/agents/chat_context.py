@@ -0,0 +1,160 @@
+import json
+from tools.parser_tool import parser_tool
+from tools.patient_store import patient_store
+from tools.retrieval import tokenize
+from tools.tracing import tracer
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English/JSON; good enough for budgeting
+    return len(text) // 4 + 1
+
+
+def truncate_tokens(text, tokens):
+    max_chars = tokens * 4
+    return text if len(text) <= max_chars else text[:max_chars] + " …"
+
+
+CONTEXT_ORDER = ("report", "summary", "tips")  # what survives first when the context is over budget
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def fit_json(value, max_chars):
+    """value cut to whole entries (and shortened strings) whose JSON fits
+    in max_chars, in order; None if not even a part of it fits."""
+    if len(_dumps(value)) <= max_chars:
+        return value
+    if isinstance(value, str):
+        text = value[:max(0, max_chars - 3)]
+        while text and len(_dumps(text + "…")) > max_chars:
+            text = text[:len(text) - (len(_dumps(text + "…")) - max_chars)]
+        return text + "…" if text else None
+    if not isinstance(value, (dict, list)):
+        return None
+    out = {} if isinstance(value, dict) else []
+    used = 2  # {} / []
+    for key, item in (value.items() if isinstance(value, dict) else enumerate(value)):
+        overhead = (1 if out else 0) + (len(_dumps(key)) + 1 if isinstance(value, dict) else 0)
+        item = fit_json(item, max_chars - used - overhead)
+        if item is None:
+            break
+        if isinstance(value, dict):
+            out[key] = item
+        else:
+            out.append(item)
+        used += overhead + len(_dumps(item))
+    return out or None
+
+
+def fit_context(text, tokens):
+    """Report context within `tokens`, still valid JSON when it was JSON.
+
+    The report's results are kept first, then the summary, then the tips;
+    whatever does not fit is dropped entry by entry instead of cutting
+    the serialized text mid-way.
+    """
+    if estimate_tokens(text) <= tokens:
+        return text
+    try:
+        context = json.loads(text)
+    except ValueError:
+        context = None
+    if not isinstance(context, dict):
+        return truncate_tokens(text, tokens)
+    ordered = {k: context[k] for k in CONTEXT_ORDER if k in context}
+    ordered.update(context)
+    return _dumps(fit_json(ordered, (tokens - 1) * 4) or {})  # estimate_tokens adds 1
+
+
+class ChatContext:
+    """Keeps every chat prompt inside a fixed token budget.
+
+    Per conversation we store (in the chat_state table) the report context
+    once, a rolling summary of older turns, and the id of the last turn
+    folded into that summary. A prompt is: context + summary + the most
+    recent turns that still fit. Once more than `keep_turns` turns are
+    pending, the oldest ones are compacted into the summary, so only a
+    bounded number of turns is ever read back from disk.
+
+    When a query is given, the top `retrieve_k` snippets from the
+    patient's whole history (reports, doctor notes, tips) are added too,
+    so older reports can be referenced without pasting them in full.
+    """
+
+    def __init__(self, token_budget=2000, keep_turns=6, context_share=0.35, summary_share=0.15,
+                 retrieval_share=0.2, retrieve_k=8):
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.context_tokens = int(token_budget * context_share)
+        self.summary_tokens = int(token_budget * summary_share)
+        self.retrieval_tokens = int(token_budget * retrieval_share)
+        self.retrieve_k = retrieve_k
+
+    def set_context(self, user, context):
+        """Store the report context for this conversation (only written when it changes)."""
+        text = context if isinstance(context, str) else json.dumps(context, ensure_ascii=False, separators=(",", ":"))
+        if patient_store.get_chat_state(user)["context"] != text:
+            patient_store.set_chat_state(user, context=text)
+
+    def _compact(self, user, state, turns):
+        """Fold all but the last keep_turns turns into the rolling summary."""
+        old, recent = turns[:-self.keep_turns], turns[-self.keep_turns:]
+        if not old:
+            return state["summary"], recent
+        lines = [state["summary"]] if state["summary"] else []
+        lines += [f'{t["role"]}: {truncate_tokens(" ".join(t["message"].split()), 30)}' for t in old]
+        summary = "\n".join(lines)
+        # keep the newest part of the summary when it outgrows its share
+        max_chars = self.summary_tokens * 4
+        if len(summary) > max_chars:
+            summary = "…" + summary[-max_chars:]
+        patient_store.set_chat_state(user, summary=summary, summarized_upto=old[-1]["id"])
+        return summary, recent
+
+    def retrieve(self, user, query):
+        """Top-k history snippets for the query, within the retrieval share."""
+        # "haemoglobin" / "hb" in the question should also hit stored "hemoglobin" rows
+        extra = [t for name in parser_tool.find_tests(query) for t in tokenize(name)]
+        lines, used = [], 0
+        for hit in patient_store.search(user, query, self.retrieve_k, extra):
+            cost = estimate_tokens(hit["text"])
+            if lines and used + cost > self.retrieval_tokens:
+                break
+            lines.append("- " + truncate_tokens(hit["text"], self.retrieval_tokens))
+            used += cost
+        return "\n".join(lines)
+
+    @tracer.traced("chat.prompt")
+    def build_prompt(self, user, query=None):
+        state = patient_store.get_chat_state(user)
+        # at most keep_turns + a few new turns are pending between compactions
+        turns = patient_store.load_chat_after(user, state["summarized_upto"])
+        summary, recent = self._compact(user, state, turns)
+
+        parts = []
+        if state["context"]:
+            parts.append("Use this report context:\n" + fit_context(state["context"], self.context_tokens))
+            parts.append("Never ask user to upload report again.")
+        history = self.retrieve(user, query) if query else ""
+        if history:
+            parts.append("Relevant records from patient history:\n" + history)
+        if summary:
+            parts.append("Earlier in this conversation:\n" + summary)
+
+        used = sum(estimate_tokens(p) for p in parts)
+        lines = []
+        for t in reversed(recent):  # newest first until the budget is spent
+            line = f'{t["role"]}: {t["message"]}'
+            cost = estimate_tokens(line)
+            if lines and used + cost > self.token_budget:
+                break
+            lines.append(truncate_tokens(line, max(self.token_budget - used, 50)))
+            used += cost
+        parts.append("\n".join(reversed(lines)))
+        return "\n\n".join(parts)
+
+
+chat_context = ChatContext()
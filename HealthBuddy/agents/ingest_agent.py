@@ -1,8 +1,9 @@
-import json
 import os
-from datetime import datetime
-from tools.ocr_tool import ocr_tool
+from tools.lab_model import LabPanel
+from tools.ocr_cache import ocr_cache
 from tools.parser_tool import parser_tool
+from tools.patient_store import patient_store
+from tools.tracing import tracer
 
 class IngestAgent:
     def __init__(self, memory_dir="memory"):
@@ -10,30 +11,55 @@ class IngestAgent:
         os.makedirs(self.memory_dir, exist_ok=True)
 
     def run(self, file_path, patient_id="default"):
-        # 1. OCR and parse
-        text = ocr_tool.run(file_path)
-        structured = parser_tool.parse(text)
+        structured = {}
+        for test, info in self.stream(file_path, patient_id):
+            structured[test] = info
+        return structured
 
-        # 2. Save latest snapshot (overwrite patient.json for current state)
-        memory_path = os.path.join(self.memory_dir, f"{patient_id}.json")
-        with open(memory_path, "w") as f:
-            json.dump(structured, f, indent=4)
+    def stream(self, file_path, patient_id="default", save=True):
+        """Yield (test, info) as pages are OCR'd, then persist the result.
 
-        # 3. Append time-series history
-        history_path = os.path.join(self.memory_dir, f"{patient_id}_history.json")
-        snapshot = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "data": structured
-        }
+        Persistence only happens once the stream is fully consumed and at
+        least one test was found; OCR/parse errors, including pages that
+        timed out (OCRIncomplete), propagate to the caller and nothing is
+        saved. save=False leaves storing to the caller (the
+        job queue saves report and summary together, see finish_job).
+        """
+        # not made current: this generator yields to the caller in between
+        span = tracer.start_span("ingest", file=os.path.basename(file_path), patient_id=patient_id)
 
-        if os.path.exists(history_path):
-            with open(history_path, "r") as f:
-                hist = json.load(f)
-        else:
-            hist = []
+        # 1. OCR (cached by file content) and parse, page by page;
+        #    each side is timed only while it works, not while the caller does
+        structured = LabPanel()
+        pages = tracer.iter_span("ocr", ocr_cache.iter_pages(file_path), parent=span)
+        parsed = tracer.iter_span("parse", parser_tool.parse_iter(parser_tool.iter_lines(pages)), parent=span)
+        try:
+            for test, info in parsed:
+                structured.add_info(test, info)
+                yield test, info
+        except Exception as e:
+            span.error = type(e).__name__  # unreadable / partly OCR'd file: nothing is saved
+            span.finish()
+            raise
+        except GeneratorExit:
+            span.set(stopped_early=True)  # e.g. job cancelled; nothing is saved
+            span.finish()
+            raise
+        finally:
+            parsed.close()
+            pages.close()
+        if save and structured:
+            with tracer.span("save", parent=span):
+                self._save(structured, patient_id)
+        span.set(tests=len(structured))
+        span.finish()
 
-        hist.append(snapshot)
-        with open(history_path, "w") as f:
-            json.dump(hist, f, indent=4)
+    def _save(self, structured, patient_id):
+        # 2. Append time-series history (one INSERT, independent of history length);
+        #    the newest row is the patient's latest snapshot (see latest_report)
+        self.import_legacy(patient_id)
+        patient_store.append_history(patient_id, structured)
 
-        return structured
+    def import_legacy(self, patient_id):
+        legacy_path = os.path.join(self.memory_dir, f"{patient_id}_history.json")
+        patient_store.import_legacy_history(patient_id, legacy_path)
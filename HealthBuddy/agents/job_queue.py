@@ -0,0 +1,151 @@
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+from agents.orchestrator import HealthAgentOrchestrator
+from tools.patient_store import patient_store
+from tools.tracing import tracer
+
+INGEST_SHARE = 0.6  # OCR dominates; the summary/LLM stages share the rest
+
+log = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class NoTestsFound(Exception):
+    pass
+
+
+class JobQueue:
+    """Background report processing so the dashboard never blocks on OCR/LLM.
+
+    Jobs are rows in the patient store's jobs table (status, stage,
+    progress, result), so any session can poll them by id and unfinished
+    jobs are picked up again after a restart. A small pool of worker
+    threads runs the orchestrator's report pipeline; each worker starts at
+    most `max_jobs_per_minute` jobs per minute. Nothing is stored until the
+    pipeline has finished (report, summary and status in one transaction),
+    so a cancelled job leaves no report behind and a job resumed after a
+    restart just runs again from ingest (the OCR is cached).
+    """
+
+    def __init__(self, orchestrator=None, store=patient_store, workers=2, max_jobs_per_minute=None):
+        self.orchestrator = orchestrator or HealthAgentOrchestrator()
+        self.store = store
+        self.workers = workers
+        self.min_interval = 60.0 / max_jobs_per_minute if max_jobs_per_minute else 0.0
+        self._queue = queue.Queue()
+        self._cancelled = set()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for job_id in self.store.unfinished_jobs():  # resume after restart
+                self._queue.put(job_id)
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"ingest-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, file_path, patient_id="user1"):
+        self.start()
+        job_id = uuid.uuid4().hex
+        self.store.create_job(job_id, patient_id, file_path)
+        self._queue.put(job_id)
+        return job_id
+
+    def status(self, job_id):
+        return self.store.get_job(job_id)
+
+    def cancel(self, job_id):
+        with self._lock:
+            self._cancelled.add(job_id)
+        job = self.store.get_job(job_id)
+        if job and job["status"] == "queued":
+            self.store.update_job(job_id, status="cancelled")
+
+    def _check_cancel(self, job_id):
+        if job_id in self._cancelled:
+            raise JobCancelled()
+
+    def _worker(self):
+        last_start = 0.0
+        while True:
+            job_id = self._queue.get()
+            try:
+                job = self.store.get_job(job_id)
+                if not job or job["status"] not in ("queued", "running"):
+                    with self._lock:
+                        self._cancelled.discard(job_id)
+                    continue  # cancelled while queued, or already handled
+
+                # per-worker throughput cap
+                wait = last_start + self.min_interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                last_start = time.monotonic()
+
+                self._process(job)
+            except Exception:
+                # e.g. the store failed while claiming or finishing the job:
+                # keep the worker alive for the next one
+                log.exception("job %s: worker error", job_id)
+                tracer.count("healthbuddy_job_worker_errors_total")
+                try:
+                    self.store.update_job(job_id, status="failed", error="internal error, see server log")
+                except Exception:
+                    pass
+            finally:
+                self._queue.task_done()
+
+    def _progress(self, job_id, stage, progress):
+        self.store.update_job(job_id, stage=stage, progress=progress)
+
+    def _process(self, job):
+        job_id, patient_id, path = job["id"], job["patient_id"], job["file_path"]
+        with tracer.span("job", job_id=job_id, patient_id=patient_id, file=os.path.basename(path)) as span:
+            self.store.update_job(job_id, status="running", stage="ingest", progress=0.05)
+            orc = self.orchestrator
+            try:
+                raw = {}
+                for test, info in orc.ingest.stream(path, patient_id, save=False):
+                    self._check_cancel(job_id)
+                    raw[test] = info
+                    self._progress(job_id, f"ingest: {len(raw)} tests found", 0.3)
+                if not raw:
+                    raise NoTestsFound("No recognised lab tests in the report")
+                self._progress(job_id, "ingest", INGEST_SHARE)
+
+                pipeline = orc.report_pipeline(path, patient_id)
+                remaining = len(pipeline.steps) - 1
+                for i, (stage, _) in enumerate(pipeline.run(done={"ingest": raw}), 1):
+                    self._check_cancel(job_id)
+                    self._progress(job_id, stage, INGEST_SHARE + (0.95 - INGEST_SHARE) * i / remaining)
+
+                report = orc.collect_report(pipeline.results)
+                self._check_cancel(job_id)
+                orc.ingest.import_legacy(patient_id)
+                self.store.finish_job(job_id, patient_id, report, {**report, "latencies": pipeline.latencies})
+                span.set(status="done")
+            except JobCancelled:
+                self.store.update_job(job_id, status="cancelled")
+                span.set(status="cancelled")
+            except Exception as e:
+                self.store.update_job(job_id, status="failed", error=str(e))
+                span.set(status="failed")
+                span.error = type(e).__name__
+            finally:
+                with self._lock:
+                    self._cancelled.discard(job_id)
+
+
+job_queue = JobQueue()
@@ -2,6 +2,9 @@ from agents.ingest_agent import IngestAgent
 from agents.summary_agent import SummaryAgent
 from agents.symptom_agent import SymptomAgent
 from agents.tips_agent import TipsAgent
+from agents.pipeline import Pipeline
+from tools.patient_store import patient_store
+from tools.tracing import tracer
 
 class HealthAgentOrchestrator:
     def __init__(self):
@@ -10,13 +13,52 @@ class HealthAgentOrchestrator:
         self.symptom = SymptomAgent()
         self.tips = TipsAgent()
 
+    def report_pipeline(self, file_path, patient_id="user1"):
+        """Upload -> summary -> (doctor-note LLM, tips LLM) as a dependency graph.
+
+        The rule-based summary only needs the parsed data, and the
+        doctor-note enhancement and tips generation only need that
+        summary, so the two LLM round trips run concurrently.
+        """
+        p = Pipeline()
+        p.add("ingest", lambda: self.ingest.run(file_path, patient_id))
+        p.add("rule_summary", lambda ingest: self.summary.run_rule_based(ingest), deps=["ingest"])
+        p.add("doctor_note", self._doctor_note, deps=["rule_summary"])
+        p.add("tips", lambda ingest, rule_summary: self.tips.generate(ingest, rule_summary),
+              deps=["ingest", "rule_summary"])
+        return p
+
+    def _doctor_note(self, rule_summary):
+        if "error" in rule_summary:
+            return ""
+        return self.summary.enhance_doctor_note(rule_summary["doctor_note"])
+
+    @staticmethod
+    def collect_report(results):
+        """Final {extracted, summary, tips} from a finished report_pipeline."""
+        summary = dict(results["rule_summary"])
+        if results.get("doctor_note"):
+            summary["doctor_note"] = results["doctor_note"]
+        return {"extracted": results["ingest"], "summary": summary, "tips": results["tips"]}
+
     def run(self, action, **kwargs):
+        with tracer.span(f"orchestrator.{action}", patient_id=kwargs.get("patient_id", "user1")):
+            return self._run(action, **kwargs)
+
+    def _run(self, action, **kwargs):
         if action == "upload_report":
             return self.ingest.run(kwargs["file_path"], kwargs.get("patient_id","user1"))
+        if action == "full_report":
+            p = self.report_pipeline(kwargs["file_path"], kwargs.get("patient_id","user1"))
+            for _ in p.run():
+                pass
+            return {**self.collect_report(p.results), "latencies": p.latencies}
         if action == "summary":
             return self.summary.run(kwargs.get("patient_id","user1"))
         if action == "symptoms":
             return self.symptom.run(kwargs["text"])
         if action == "tips":
             return self.tips.run(kwargs.get("patient_id","user1"))
+        if action == "trends":
+            return patient_store.trends(kwargs.get("patient_id","user1"))
         return {"error": "Invalid action"}
@@ -0,0 +1,63 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from tools.tracing import tracer
+
+
+class Pipeline:
+    """Tiny dependency-graph executor for agent steps.
+
+    Each step is fn(**{dep: result_of_dep}); a step is started as soon as
+    all its deps are done, so independent steps (e.g. two LLM calls) run
+    concurrently on a thread pool. run() yields (name, result) in
+    completion order and records per-step wall time in `latencies`.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.steps = {}  # name -> (fn, deps)
+        self.latencies = {}
+        self.results = {}
+
+    def add(self, name, fn, deps=()):
+        for d in deps:
+            if d not in self.steps:
+                raise ValueError(f"step {name!r} depends on unknown step {d!r}")
+        self.steps[name] = (fn, tuple(deps))
+        return self
+
+    def _timed(self, name, fn, kwargs):
+        start = time.perf_counter()
+        try:
+            with tracer.span(f"step.{name}"):
+                return fn(**kwargs)
+        finally:
+            self.latencies[name] = time.perf_counter() - start
+
+    def run(self, done=None):
+        """Execute the graph. `done` pre-seeds results for steps already computed."""
+        results = dict(done or {})
+        pending = {n: s for n, s in self.steps.items() if n not in results}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for name, (fn, deps) in list(pending.items()):
+                    if all(d in results for d in deps):
+                        kwargs = {d: results[d] for d in deps}
+                        # run in a copy of our context so the step's spans nest under the caller's
+                        ctx = contextvars.copy_context()
+                        running[pool.submit(ctx.run, self._timed, name, fn, kwargs)] = name
+                        del pending[name]
+
+                if not running:
+                    raise RuntimeError(f"unsatisfiable steps: {sorted(pending)}")
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    name = running.pop(fut)
+                    results[name] = fut.result()  # re-raises step errors
+                    yield name, results[name]
+
+        self.results = results
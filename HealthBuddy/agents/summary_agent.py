@@ -1,71 +1,40 @@
-import json, os
 from datetime import datetime
+from tools.lab_model import LabPanel, LabResult, parse_range
+from tools.llm_client import llm_client
+from tools.patient_store import patient_store
+from tools.threshold_engine import threshold_engine
+from tools.tracing import tracer
 
 # Optional Gemini wrapper (user can set GEMINI_API_KEY in env)
 def gemini_generate(prompt, language="en"):
-    key = os.environ.get("GEMINI_API_KEY")
-    if not key:
-        return ""  # empty => fallback to local rule-based note
-    try:
-        import google.generativeai as genai
-        genai.configure(api_key=key)
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        resp = model.generate_content(prompt)
-        return resp.text
-    except Exception as e:
-        return ""
-
-# Some simple clinical thresholds (example). These are illustrative, not exhaustive.
-THRESHOLDS = {
-    "hemoglobin": {"low": 12.0, "high": 18.0, "unit":"g/dL"},
-    "wbc": {"low": 4000, "high": 11000, "unit": "cells/uL"},
-    "platelets": {"low": 150000, "high": 450000, "unit": "cells/uL"},
-    "creatinine": {"low": 0.6, "high": 1.3, "unit":"mg/dL"},
-    "tsh": {"low": 0.4, "high": 4.0, "unit":"µIU/mL"},
-    "fbs": {"low": 70, "high": 99, "unit":"mg/dL"},
-    "ppbs": {"low": 70, "high": 140, "unit":"mg/dL"},
-    "hba1c": {"low": 4.0, "high": 5.6, "unit":"%"},
-    "amh": {"low": 0.5, "high": 3.5, "unit":"ng/mL"},
-    "fs h": {"low": 1.0, "high": 15.0, "unit":""},
-    "fsh": {"low": 1.0, "high": 15.0, "unit":""},
-    # add more as needed
-}
+    # empty => fallback to local rule-based note
+    return llm_client.generate(prompt)
 
 class SummaryAgent:
-    def __init__(self, memory_dir="memory"):
-        self.memory_dir = memory_dir
+    def __init__(self, store=patient_store):
+        self.store = store
 
     def load_patient(self, patient_id="default"):
-        path = os.path.join(self.memory_dir, f"{patient_id}.json")
-        if not os.path.exists(path):
-            return {}
-        return json.load(open(path))
+        return self.store.latest_report(patient_id)
 
     def detect_abnormal(self, key, info):
-        k = key.lower()
-        val = info.get("value")
-        if val is None:
+        """Low/High/Normal for one parser-style {"value", "flag", "reference_range"} dict."""
+        low, high = parse_range(info.get("reference_range"))
+        return self._status(LabResult(key, info.get("value"), flag=info.get("flag", ""), low=low, high=high))
+
+    def _status(self, result):
+        if result.value is None:
             return ""
-        # exact key match first
-        if k in THRESHOLDS:
-            t = THRESHOLDS[k]
-            if val < t["low"]:
-                return "Low"
-            if val > t["high"]:
-                return "High"
-            return "Normal"
-        # try partial match
-        for tk,t in THRESHOLDS.items():
-            if tk in k:
-                if val < t["low"]:
-                    return "Low"
-                if val > t["high"]:
-                    return "High"
-                return "Normal"
-        # fallback to provided flag or empty
-        return info.get("flag","")
+        # threshold range (key resolution is memoized by the engine)
+        status = threshold_engine.classify(result.test, result.value)
+        if status:
+            return status
+        # fallback to the report's own reference range, then its flag
+        return result.status() or result.flag
 
-    def build_report_strings(self, data):
+    @tracer.traced("summary.rule_based")
+    def build_rule_based(self, data):
+        """English/Hindi summaries and the rule-based doctor note (no LLM call)."""
         lines_en = []
         lines_hi = []
         # header
@@ -75,9 +44,11 @@ class SummaryAgent:
 
         doctor_lines = []  # aggregate points for doctor-note
 
-        for key, info in data.items():
-            line = f"{key.upper().replace('_',' ')}: {info.get('value','')} {info.get('unit','')}".strip()
-            status = self.detect_abnormal(key, info)
+        for result in LabPanel.load(data):
+            key = result.test
+            value = "" if result.value is None else result.value
+            line = f"{key.upper().replace('_',' ')}: {value} {result.unit.value}".strip()
+            status = self._status(result)
             if status:
                 line += f"  |  Status: {status}"
             lines_en.append(line)
@@ -89,9 +60,9 @@ class SummaryAgent:
 
             # build doctor note bullet
             if status == "Low":
-                doctor_lines.append(f"{key.upper()}: LOW (value {info.get('value')})")
+                doctor_lines.append(f"{key.upper()}: LOW (value {result.value})")
             if status == "High":
-                doctor_lines.append(f"{key.upper()}: HIGH (value {info.get('value')})")
+                doctor_lines.append(f"{key.upper()}: HIGH (value {result.value})")
 
         # doctor-note (rule-based)
         if doctor_lines:
@@ -99,18 +70,31 @@ class SummaryAgent:
         else:
             dr = "No immediate abnormal alerts detected."
 
+        return "\n".join(lines_en), "\n".join(lines_hi), dr
+
+    @tracer.traced("summary.doctor_note")
+    def enhance_doctor_note(self, dr):
         # try to enhance with Gemini (if user has API)
         enhanced_dr = gemini_generate("Please convert the following doctor note into concise clinical bullet points:\n" + dr, language="en")
         if enhanced_dr:
-            doctor_note = enhanced_dr
-        else:
-            doctor_note = dr
+            return enhanced_dr
+        return dr
 
-        return "\n".join(lines_en), "\n".join(lines_hi), doctor_note
+    def build_report_strings(self, data):
+        en, hi, dr = self.build_rule_based(data)
+        return en, hi, self.enhance_doctor_note(dr)
 
+    @tracer.traced("summary")
     def run(self, patient_id="default"):
         data = self.load_patient(patient_id)
         if not data:
             return {"error": "no data"}
         en, hi, doctor_note = self.build_report_strings(data)
         return {"english_summary": en, "hindi_summary": hi, "doctor_note": doctor_note}
+
+    def run_rule_based(self, data):
+        """Summary of already-parsed data with the un-enhanced doctor note."""
+        if not data:
+            return {"error": "no data"}
+        en, hi, dr = self.build_rule_based(data)
+        return {"english_summary": en, "hindi_summary": hi, "doctor_note": dr}
@@ -1,9 +1,11 @@
-import json, os
+import json
+from tools.patient_store import patient_store
+from tools.llm_client import llm_client
+from tools.tracing import tracer
 
 class TipsAgent:
     def run(self, patient_id="default"):
-        path = os.path.join("memory", f"{patient_id}.json")
-        data = json.load(open(path))
+        data = patient_store.latest_report(patient_id)
 
         return {
             "tips": [
@@ -12,3 +14,33 @@ class TipsAgent:
                 "Sleep well"
             ]
         }
+
+    @tracer.traced("tips")
+    def generate(self, extracted, summary):
+        """Report-based Hinglish tips from Gemini, as a list of strings."""
+        if not llm_client.available():
+            return ["Gemini SDK / API key set nahi hai."]
+
+        prompt = f"""
+        Based on the following blood/lab report:
+        LAB DATA: {json.dumps(extracted, ensure_ascii=False)}
+        SUMMARY: {json.dumps(summary, ensure_ascii=False)}
+
+        Generate 5–8 helpful, SAFE, Hinglish health tips.
+        Format MUST be bullet list starting with "-".
+        """
+
+        try:
+            # Auto-detected model first (discovered once per process), then fallbacks
+            text = llm_client.generate(prompt, models=llm_client.candidate_models()).strip()
+            if text:
+                tips = []
+                for ln in text.splitlines():
+                    if ln.startswith("-") or ln.startswith("•"):
+                        tips.append(ln.lstrip("-• ").strip())
+                return tips or [text]
+
+            return [f"Tips generate nahi ho paye. Last Error: {llm_client.last_error}"]
+
+        except Exception as e:
+            return [f"Critical Gemini Error: {e}"]
@@ -0,0 +1,275 @@
+"""Headless HTTP API for HealthBuddy (no Streamlit needed).
+
+    uvicorn api_server:app --host 0.0.0.0 --port 8000
+
+    curl -F file=@report.pdf -F patient_id=user1 localhost:8000/reports   # -> 202 {"job_id"}
+    curl localhost:8000/jobs/<job_id>                                     # status / result
+    curl localhost:8000/patients/user1/summary
+    curl -X POST localhost:8000/symptoms -H 'Content-Type: application/json' -d '{"text": "fever"}'
+    curl -N -X POST localhost:8000/chat -H 'Content-Type: application/json' \\
+         -d '{"user": "user1", "message": "Is my TSH ok?", "stream": true}'
+
+Agents, the job queue and the patient store are created once per process
+and shared by all requests. Blocking work (OCR, LLM, SQLite) runs in
+threads, at most HEALTHBUDDY_API_CONCURRENCY at a time; requests that
+cannot get a slot within HEALTHBUDDY_API_QUEUE_TIMEOUT seconds get a 503
+so clients back off instead of piling up. Request bodies over
+HEALTHBUDDY_MAX_UPLOAD_MB get a 413 before they are read (Content-Length)
+or as soon as they grow past it (chunked uploads). Uploads are copied to
+disk in chunks and processed by the background job queue
+(HEALTHBUDDY_JOB_WORKERS threads). Run a single server process: the job
+queue resumes unfinished jobs on start, which several processes sharing
+one database would each do.
+"""
+import asyncio
+import os
+import re
+import time
+import uuid
+import weakref
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from agents.chat_agent import ChatAgent
+from agents.job_queue import job_queue
+from tools.patient_store import patient_store
+from tools.tracing import tracer
+
+UPLOAD_DIR = os.environ.get("HEALTHBUDDY_UPLOAD_DIR", "data/uploads")
+MAX_UPLOAD_BYTES = int(os.environ.get("HEALTHBUDDY_MAX_UPLOAD_MB", "50")) * 1024 * 1024
+CONCURRENCY = int(os.environ.get("HEALTHBUDDY_API_CONCURRENCY", str(os.cpu_count() or 4)))
+QUEUE_TIMEOUT = float(os.environ.get("HEALTHBUDDY_API_QUEUE_TIMEOUT", "10"))
+EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg")
+CHUNK = 1 << 20
+
+job_queue.workers = int(os.environ.get("HEALTHBUDDY_JOB_WORKERS", str(job_queue.workers)))
+orchestrator = job_queue.orchestrator  # one set of agents for the queue and the API
+chat_agent = ChatAgent()
+
+_slots = None  # created lazily: the semaphore must belong to the server's event loop
+
+
+@asynccontextmanager
+async def lifespan(app):
+    job_queue.start()
+    yield
+
+
+app = FastAPI(title="HealthBuddy API", lifespan=lifespan)
+
+
+class SymptomsRequest(BaseModel):
+    text: str
+
+
+class ChatRequest(BaseModel):
+    user: str
+    message: str
+    context: Optional[dict] = None
+    stream: bool = False
+
+
+#############################################
+# Concurrency limit
+#############################################
+async def acquire_slot():
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(CONCURRENCY)
+    try:
+        await asyncio.wait_for(_slots.acquire(), QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        tracer.count("healthbuddy_api_rejected_total")
+        raise HTTPException(503, "Server busy, retry later", headers={"Retry-After": "5"})
+
+
+async def run_limited(fn, *args, **kwargs):
+    """Run blocking work in a thread, within the concurrency limit."""
+    await acquire_slot()
+    try:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    finally:
+        _slots.release()
+
+
+class BodyLimit:
+    """ASGI middleware: 413 for request bodies over max_bytes.
+
+    Checked on Content-Length before anything is read, and counted while
+    the body streams in (chunked requests, lying headers), so an oversized
+    upload is never spooled to disk by the form parser.
+    """
+
+    def __init__(self, app, max_bytes):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        too_large = HTTPException(413, f"Request body larger than {self.max_bytes // (1024 * 1024)} MB")
+        length = dict(scope["headers"]).get(b"content-length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse({"detail": too_large.detail}, too_large.status_code)
+            return await response(scope, receive, send)
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise too_large  # FastAPI re-raises it from body parsing -> 413
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+app.add_middleware(BodyLimit, max_bytes=MAX_UPLOAD_BYTES)
+
+
+@app.middleware("http")
+async def count_requests(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    path = route.path if route else "unmatched"
+    tracer.count("healthbuddy_api_requests_total", route=path, status=response.status_code)
+    tracer.observe("healthbuddy_api_seconds", time.perf_counter() - start, route=path)
+    return response
+
+
+#############################################
+# Reports / jobs
+#############################################
+def safe_name(filename):
+    base = os.path.basename(filename or "report")
+    return re.sub(r"[^A-Za-z0-9._-]", "_", base)[-100:]
+
+
+@app.post("/reports", status_code=202)
+async def upload_report(file: UploadFile = File(...), patient_id: str = Form("user1")):
+    """Store the upload and queue OCR + summary + tips; poll /jobs/{job_id}.
+
+    The body size limit is enforced by BodyLimit before the form is parsed.
+    """
+    name = safe_name(file.filename)
+    if not name.lower().endswith(EXTENSIONS):
+        raise HTTPException(415, f"Unsupported file type, expected one of {', '.join(EXTENSIONS)}")
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}_{name}")
+    size = 0
+    try:
+        with open(path, "wb") as out:
+            while chunk := await file.read(CHUNK):
+                size += len(chunk)
+                await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    job_id = await asyncio.to_thread(job_queue.submit, path, patient_id)
+    return {"job_id": job_id, "status": "queued", "bytes": size}
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await asyncio.to_thread(job_queue.status, job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    if not await asyncio.to_thread(job_queue.status, job_id):
+        raise HTTPException(404, "Job not found")
+    await asyncio.to_thread(job_queue.cancel, job_id)
+    return await asyncio.to_thread(job_queue.status, job_id)
+
+
+#############################################
+# Patient actions
+#############################################
+@app.get("/patients/{patient_id}/summary")
+async def summary(patient_id: str):
+    result = await run_limited(orchestrator.run, "summary", patient_id=patient_id)
+    if "error" in result:
+        raise HTTPException(404, "No report ingested for this patient")
+    return result
+
+
+@app.get("/patients/{patient_id}/tips")
+async def tips(patient_id: str):
+    latest = await asyncio.to_thread(patient_store.list_summary_page, patient_id, 0, 1)
+    if not latest:
+        raise HTTPException(404, "No report summary for this patient")
+    record = await asyncio.to_thread(patient_store.load_summary, latest[0]["id"])
+    if record["health_tips"]:
+        return {"tips": record["health_tips"], "timestamp": record["timestamp"]}
+    generated = await run_limited(orchestrator.tips.generate, record["extracted_data"], record["summary"])
+    return {"tips": generated, "timestamp": record["timestamp"]}
+
+
+@app.get("/patients/{patient_id}/trends")
+async def trends(patient_id: str):
+    return await run_limited(orchestrator.run, "trends", patient_id=patient_id)
+
+
+@app.post("/symptoms")
+async def symptoms(req: SymptomsRequest):
+    return await run_limited(orchestrator.run, "symptoms", text=req.text)
+
+
+@app.post("/chat")
+async def chat(req: ChatRequest):
+    if not req.stream:
+        reply = await run_limited(chat_agent.run, req.user, req.message, req.context)
+        return {"reply": reply}
+
+    await acquire_slot()
+    loop = asyncio.get_running_loop()
+    released = []
+
+    def release():
+        # called from Starlette's worker thread (or GC); the semaphore lives on the loop
+        if not released:
+            released.append(True)
+            loop.call_soon_threadsafe(_slots.release)
+
+    def chunks():
+        # sync generator: Starlette iterates it in a worker thread
+        try:
+            yield from chat_agent.stream(req.user, req.message, context=req.context)
+        finally:
+            release()
+
+    gen = chunks()
+    weakref.finalize(gen, release)  # client gone before streaming even started
+    return StreamingResponse(gen, media_type="text/plain; charset=utf-8")
+
+
+#############################################
+# Ops
+#############################################
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return tracer.to_prometheus()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=os.environ.get("HEALTHBUDDY_API_HOST", "127.0.0.1"),
+                port=int(os.environ.get("HEALTHBUDDY_API_PORT", "8000")))
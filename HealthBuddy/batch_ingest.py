@@ -0,0 +1,144 @@
+"""Bulk ingest of archived lab reports into the patient store.
+
+    python batch_ingest.py archive/ --patient-from-dir
+    python batch_ingest.py manifest.csv            # rows: path,patient_id
+    python batch_ingest.py archive/ --patient-id user1 --workers 8
+
+Files are hashed on a thread pool, deduplicated per patient by content
+hash, OCR'd across a process pool (one OCR worker per process) and
+written in bulk transactions of --batch-size reports. Every written file
+is recorded by (patient, hash), so after a crash the same command simply
+continues where it stopped; files that failed (unreadable, or OCR timed
+out, or no recognised lab tests) are recorded with their error and
+retried on the next run. Reports are timestamped with the file's mtime
+and stored as backfill: they join the history and trends, but the
+dashboard's latest snapshot stays the patient's newest upload.
+"""
+import argparse
+import csv
+import os
+import time
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from tools.ocr_cache import file_hash
+from tools.ocr_tool import OCRTool
+from tools.parser_tool import parser_tool
+from tools.patient_store import PatientStore
+
+EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg")
+
+_ocr = OCRTool(workers=1)  # parallelism comes from the process pool
+
+
+def collect(source, patient_id, patient_from_dir):
+    """[(path, patient_id)] from a directory tree or a CSV/plain-text manifest."""
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(EXTENSIONS):
+                    pid = os.path.basename(root) if patient_from_dir else patient_id
+                    yield os.path.join(root, name), pid
+        return
+
+    with open(source, newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith("#"):
+                continue
+            yield row[0].strip(), (row[1].strip() if len(row) > 1 else patient_id)
+
+
+def process_file(path):
+    """Worker: OCR + parse one file -> (path, data or None, error, timings)."""
+    t0 = time.perf_counter()
+    text, pages = _ocr.run_timed(path)
+    t1 = time.perf_counter()
+    timeouts = sum("timeout" in p for p in pages)
+    if text.startswith(("PDF Error:", "Image Error:")) or timeouts:
+        error = text if not timeouts else f"OCR timed out on {timeouts} page(s)"
+        return path, None, error, {"ocr": t1 - t0, "parse": 0.0}
+    data = parser_tool.parse(text)
+    if not data:
+        return path, None, "no recognised lab tests", {"ocr": t1 - t0, "parse": time.perf_counter() - t1}
+    return path, data, None, {"ocr": t1 - t0, "parse": time.perf_counter() - t1}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("source", help="directory to walk, or manifest file (path[,patient_id] per line)")
+    ap.add_argument("--patient-id", default="user1", help="patient id when none is given per file")
+    ap.add_argument("--patient-from-dir", action="store_true", help="use each file's folder name as patient id")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--batch-size", type=int, default=200, help="reports per database transaction")
+    ap.add_argument("--db", default="memory/healthbuddy.db")
+    args = ap.parse_args()
+
+    store = PatientStore(args.db)
+    done = store.ingested_hashes()
+    stage = {"hash": 0.0, "ocr": 0.0, "parse": 0.0, "write": 0.0}
+    start = time.perf_counter()
+
+    # 1. hash (hashlib releases the GIL, so threads are enough) + dedupe per
+    #    patient, against the store and within this run
+    files = list(collect(args.source, args.patient_id, args.patient_from_dir))
+    t = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        hashes = list(pool.map(file_hash, [path for path, _ in files]))
+    stage["hash"] = time.perf_counter() - t
+    retry = store.failed_ingests()
+    todo, meta = [], {}
+    skipped = retried = 0
+    for (path, pid), h in zip(files, hashes):
+        if (pid, h) in done:
+            skipped += 1
+            continue
+        done.add((pid, h))
+        retried += (pid, h) in retry
+        todo.append(path)
+        meta[path] = (pid, h)
+    print(f"{len(todo)} files to ingest ({retried} failed last time), {skipped} already ingested / duplicate")
+
+    # 2. OCR + parse in the pool, 3. write in bulk transactions
+    written, batch, failures = 0, [], []
+
+    def flush():
+        nonlocal written
+        t = time.perf_counter()
+        written += store.bulk_add_reports(batch)
+        stage["write"] += time.perf_counter() - t
+        batch.clear()
+
+    chunksize = max(1, min(16, len(todo) // (args.workers * 4) or 1))
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for path, data, error, timings in pool.map(process_file, todo, chunksize=chunksize):
+            stage["ocr"] += timings["ocr"]
+            stage["parse"] += timings["parse"]
+            pid, h = meta[path]
+            if error:
+                failures.append((pid, h, path, error))
+                print(f"  ! {path}: {error}")
+                continue
+            # archive files carry no report date; file mtime is the best proxy
+            ts = datetime.utcfromtimestamp(os.path.getmtime(path)).isoformat()
+            batch.append((pid, h, path, data, ts))
+            if len(batch) >= args.batch_size:
+                flush()
+                print(f"  {written}/{len(todo)} written")
+    if batch:
+        flush()
+    store.record_ingest_failures(failures)
+
+    elapsed = time.perf_counter() - start
+    failed = len(failures)
+    processed = written + failed
+    print(f"\nIngested {written} reports ({failed} failed, {skipped} skipped) in {elapsed:.1f}s "
+          f"- {processed / elapsed if elapsed else 0:.2f} files/sec")
+    print("Per-stage time (hash wall clock, OCR/parse summed over workers):")
+    for name, secs in stage.items():
+        per_file = secs / processed if processed else 0.0
+        print(f"  {name:<6} {secs:8.2f}s total  {per_file * 1000:8.1f} ms/file")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Cold import time of the HealthBuddy entry points (python -X importtime).
+
+    python import_benchmark.py                     # report + gate, exit 1 on failure
+    python import_benchmark.py --runs 10 --budget-ms 150
+    python import_benchmark.py --modules agents.chat_agent --top 15
+
+Each entry module is imported in a fresh interpreter (in a scratch
+directory, so the memory/ store is not touched) and -X importtime is
+parsed for the cumulative time and the full list of modules loaded. The
+gate fails when an entry point pulls in one of the heavy libraries that
+tools/lazy_import.py defers (pytesseract, PyMuPDF, PIL, OpenCV, NumPy,
+pandas, google.generativeai), or when --budget-ms is set and the median
+import time exceeds it. Use it in CI after touching module-level imports.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ENTRY_POINTS = ("tools.patient_store", "agents.chat_agent", "agents.orchestrator", "agents.job_queue")
+HEAVY = ("pytesseract", "fitz", "pymupdf", "PIL", "cv2", "numpy", "pandas", "google.generativeai")
+
+
+def import_profile(module, workdir):
+    """{name: (self_us, cumulative_us)} for one cold `import module`."""
+    env = dict(os.environ, PYTHONPATH=HERE + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=workdir, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    profile = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+def heavy_modules(profile):
+    return sorted(name for name in profile if name.split(".")[0] in HEAVY or name in HEAVY)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--modules", default=",".join(ENTRY_POINTS), help="entry modules to import")
+    ap.add_argument("--runs", type=int, default=5, help="fresh interpreters per module (median is reported)")
+    ap.add_argument("--budget-ms", type=float, help="fail when a module's median import time exceeds this")
+    ap.add_argument("--top", type=int, default=5, help="slowest imports to list per module (by self time)")
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args()
+
+    results, failures = [], []
+    with tempfile.TemporaryDirectory(prefix="healthbuddy_imports_") as workdir:
+        for module in args.modules.split(","):
+            profiles = [import_profile(module, workdir) for _ in range(args.runs)]
+            median_ms = statistics.median(p[module][1] for p in profiles) / 1000
+            heavy = heavy_modules(profiles[-1])
+            slowest = sorted(profiles[-1].items(), key=lambda kv: kv[1][0], reverse=True)[:args.top]
+
+            print(f"{module:<22} {median_ms:8.1f} ms  ({len(profiles[-1])} modules)")
+            for name, (self_us, _) in slowest:
+                print(f"    {self_us / 1000:7.1f} ms  {name}")
+            if heavy:
+                failures.append(f"{module} imports {', '.join(sorted({h.split('.')[0] for h in heavy}))}")
+            if args.budget_ms is not None and median_ms > args.budget_ms:
+                failures.append(f"{module} takes {median_ms:.1f} ms > budget {args.budget_ms:.1f} ms")
+            results.append({"module": module, "median_ms": median_ms, "modules": len(profiles[-1]),
+                            "heavy": heavy})
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if failures:
+        print("\nFAIL")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nOK: no heavy imports at startup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Import the old JSON memory files into the SQLite patient store.
+
+    python migrate_json.py [--memory-dir memory]
+
+Picks up:
+  memory/{patient_id}_history.json   -> reports + analyte_values
+  memory/{patient_id}/{epoch}.json   -> summaries
+  memory/chat/{user}.json            -> chats
+
+Each file is renamed to *.imported once it is in the database, so the
+script can be re-run safely (e.g. after an interruption).
+"""
+import argparse
+import os
+
+from tools.patient_store import PatientStore
+
+
+def migrate(memory_dir, store):
+    counts = {"reports": 0, "summaries": 0, "chats": 0}
+
+    for name in sorted(os.listdir(memory_dir)):
+        path = os.path.join(memory_dir, name)
+
+        if name.endswith("_history.json"):
+            patient_id = name[: -len("_history.json")]
+            counts["reports"] += store.import_legacy_history(patient_id, path)
+
+        elif name == "chat" and os.path.isdir(path):
+            for chat_file in sorted(os.listdir(path)):
+                if chat_file.endswith(".json"):
+                    user = chat_file[: -len(".json")]
+                    counts["chats"] += store.import_legacy_chat(user, os.path.join(path, chat_file))
+
+        elif os.path.isdir(path) and name != "ocr_cache":
+            for rec_file in sorted(os.listdir(path)):
+                if rec_file.endswith(".json"):
+                    counts["summaries"] += store.import_legacy_record(name, os.path.join(path, rec_file))
+
+    return counts
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--memory-dir", default="memory")
+    ap.add_argument("--db", default=None, help="database path (default: <memory-dir>/healthbuddy.db)")
+    args = ap.parse_args()
+
+    store = PatientStore(args.db or os.path.join(args.memory_dir, "healthbuddy.db"))
+    counts = migrate(args.memory_dir, store)
+    print(f"Imported {counts['reports']} reports, {counts['summaries']} summaries, "
+          f"{counts['chats']} chat messages into {store.db_path}")
+
+
+if __name__ == "__main__":
+    main()
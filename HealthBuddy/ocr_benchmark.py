@@ -0,0 +1,166 @@
+"""OCR speed/accuracy benchmark over a fixture set of scanned reports.
+
+    python ocr_benchmark.py --make-fixtures data/ocr_fixtures   # synthetic scans
+    python ocr_benchmark.py data/ocr_fixtures
+    python ocr_benchmark.py data/ocr_fixtures --json results.json
+
+A fixture is a report file (.pdf/.png/.jpg) plus `<name>.expected.json`
+holding {test: value}. Every fixture is OCR'd + parsed with each
+configuration below; we report seconds per page and extraction accuracy
+(share of expected tests found with the right value).
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from tools.ocr_tool import OCRTool
+from tools.parser_tool import parser_tool
+
+EXTENSIONS = (".pdf", ".png", ".jpg", ".jpeg")
+
+CONFIGS = {
+    # what OCRTool did before preprocessing: 72 DPI color render, default Tesseract, flat text
+    "baseline": dict(preprocessor=False, dpi=72, tesseract_config="", structured=False),
+    "tuned": dict(),  # OCRTool defaults: preprocess + adaptive DPI + table config + table rows
+}
+
+PANELS = [
+    {"hemoglobin": 11.4, "wbc": 7200, "platelets": 245000, "creatinine": 0.9},
+    {"tsh": 5.8, "fbs": 112, "hba1c": 6.1, "ppbs": 168},
+    {"amh": 1.2, "fsh": 8.4, "lh": 6.1, "prolactin": 14.2},
+    {"vitamin_d": 18.5, "vitamin_b12": 310, "urea": 22, "sgpt": 41},
+]
+LABELS = {
+    "hemoglobin": ("Hemoglobin", "g/dL"), "wbc": ("WBC Count", "cells/uL"),
+    "platelets": ("Platelet Count", "cells/uL"), "creatinine": ("Creatinine", "mg/dL"),
+    "tsh": ("TSH", "uIU/mL"), "fbs": ("Fasting Blood Sugar", "mg/dL"), "hba1c": ("HbA1c", "%"),
+    "ppbs": ("Post Prandial Blood Sugar", "mg/dL"), "amh": ("AMH", "ng/mL"), "fsh": ("FSH", "mIU/mL"),
+    "lh": ("LH", "mIU/mL"), "prolactin": ("Prolactin", "ng/mL"), "vitamin_d": ("Vitamin D", "ng/mL"),
+    "vitamin_b12": ("Vitamin B12", "pg/mL"), "urea": ("Blood Urea", "mg/dL"), "sgpt": ("SGPT (ALT)", "U/L"),
+}
+
+
+def make_fixtures(out_dir, seed=0):
+    """Write scanned-looking reports (skewed, noisy, tinted, image-only PDFs and PNGs)."""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    font = ImageFont.load_default(size=34)
+    for i, panel in enumerate(PANELS * 2):
+        # A4 at 200 DPI, off-white paper
+        img = Image.new("RGB", (1654, 2339), (245, 240, 228))
+        d = ImageDraw.Draw(img)
+        d.text((140, 140), "CITY DIAGNOSTICS - LABORATORY REPORT", fill=(20, 20, 60), font=font)
+        d.text((140, 200), f"Patient: Fixture {i}    Sample: Serum", fill=(20, 20, 20), font=font)
+        for row, (test, value) in enumerate(panel.items()):
+            name, unit = LABELS[test]
+            y = 320 + row * 64
+            d.text((140, y), name, fill=(10, 10, 10), font=font)
+            d.text((780, y), f"{value:g}", fill=(10, 10, 10), font=font)
+            d.text((1050, y), unit, fill=(10, 10, 10), font=font)
+        img = img.rotate(rng.uniform(-4, 4), resample=Image.BICUBIC, fillcolor=(245, 240, 228))
+        img = img.filter(ImageFilter.GaussianBlur(0.6))
+        noise = Image.effect_noise(img.size, 18).convert("RGB")
+        img = Image.blend(img, noise, 0.12)
+
+        stem = os.path.join(out_dir, f"report_{i:02d}")
+        if i % 2 == 0:
+            png = stem + ".scan.png"
+            img.save(png, dpi=(200, 200))
+            with fitz.open() as doc:
+                page = doc.new_page(width=595, height=842)
+                page.insert_image(page.rect, filename=png)
+                doc.save(stem + ".pdf")
+            os.remove(png)
+        else:
+            img.save(stem + ".png", dpi=(200, 200))
+        with open(stem + ".expected.json", "w") as f:
+            json.dump(panel, f, indent=2)
+    print(f"Wrote {len(PANELS) * 2} fixtures to {out_dir}")
+
+
+def load_fixtures(fixture_dir):
+    for name in sorted(os.listdir(fixture_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in EXTENSIONS:
+            continue
+        expected = os.path.join(fixture_dir, stem + ".expected.json")
+        if os.path.exists(expected):
+            with open(expected) as f:
+                yield os.path.join(fixture_dir, name), json.load(f)
+
+
+def page_count(path):
+    if not path.lower().endswith(".pdf"):
+        return 1
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+
+def score(parsed, expected):
+    hits = 0
+    for test, value in expected.items():
+        got = parsed.get(test, {}).get("value")
+        if got is not None and abs(got - value) <= 1e-6 * max(1.0, abs(value)):
+            hits += 1
+    return hits
+
+
+def bench(tool, fixtures):
+    pages, secs, hits, total, errors = 0, 0.0, 0, 0, 0
+    for path, expected in fixtures:
+        t = time.perf_counter()
+        text = tool.run(path)
+        secs += time.perf_counter() - t
+        pages += page_count(path)
+        if text.startswith(("PDF Error:", "Image Error:")):
+            errors += 1
+            print(f"  ! {path}: {text}")
+        hits += score(parser_tool.parse(text), expected)
+        total += len(expected)
+    return {
+        "pages": pages,
+        "seconds_per_page": secs / pages if pages else 0.0,
+        "accuracy": hits / total if total else 0.0,
+        "found": hits,
+        "expected": total,
+        "errors": errors,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("fixtures", help="fixture directory")
+    ap.add_argument("--make-fixtures", action="store_true", help="generate synthetic fixtures into the directory")
+    ap.add_argument("--configs", default=",".join(CONFIGS), help="comma-separated subset of: " + ", ".join(CONFIGS))
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args()
+
+    if args.make_fixtures:
+        make_fixtures(args.fixtures)
+        return
+
+    fixtures = list(load_fixtures(args.fixtures))
+    if not fixtures:
+        raise SystemExit(f"No fixtures (report + .expected.json) in {args.fixtures}")
+
+    results = {}
+    print(f"{len(fixtures)} fixtures\n")
+    print(f"{'config':<10} {'pages':>5} {'s/page':>8} {'accuracy':>9}")
+    for name in args.configs.split(","):
+        # serial, so s/page is per-page cost rather than pool throughput
+        results[name] = r = bench(OCRTool(workers=1, **CONFIGS[name]), fixtures)
+        print(f"{name:<10} {r['pages']:>5} {r['seconds_per_page']:>8.3f} "
+              f"{r['accuracy'] * 100:>8.1f}%  ({r['found']}/{r['expected']})")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""Benchmark of the ingest -> summary pipeline on synthetic lab reports.
+
+    python pipeline_benchmark.py                                  # default grid
+    python pipeline_benchmark.py --pages 1,10 --variants text_pdf --iterations 3
+    python pipeline_benchmark.py --out after.json --compare before.json
+
+Generates text-layer PDFs, scanned (image-only) PDFs and single images
+with 1-100 pages and varied analyte counts, then times each stage with
+the LLM stubbed: OCR, parse, summary, history write/read, and the full
+report pipeline. For every (stage, fixture) it records throughput,
+p50/p95 latency and peak Python memory (tracemalloc, one extra run so
+tracing does not skew the timings) and writes them to a JSON file that
+--compare diffs against an earlier run. Everything runs in a scratch
+directory, so the real memory/ store is never touched.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ["HEALTHBUDDY_LLM_BACKEND"] = "stub"  # before any agent import
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageDraw, ImageFont
+
+from tools.ocr_tool import OCRTool, PageTimeout
+from tools.parser_tool import parser_tool
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+VARIANTS = ("text_pdf", "scanned_pdf", "image")
+RANGES = {  # plausible value ranges for synthetic results
+    "hemoglobin": (8, 18), "wbc": (3000, 14000), "platelets": (100000, 500000),
+    "bilirubin_total": (0.2, 2.5), "sgot": (10, 80), "sgpt": (10, 90), "creatinine": (0.5, 2.0),
+    "urea": (10, 60), "tsh": (0.2, 8), "t3": (0.6, 2.2), "t4": (4, 14), "vitamin_d": (8, 80),
+    "vitamin_b12": (150, 1100), "fbs": (60, 180), "ppbs": (80, 250), "hba1c": (4, 10),
+    "fsh": (1, 20), "lh": (1, 20), "prolactin": (3, 40), "amh": (0.2, 6),
+}
+
+
+#################
+# Fixtures
+#################
+def report_rows(analytes, rng):
+    rows = []
+    for test in rng.sample(sorted(RANGES), min(analytes, len(RANGES))):
+        low, high = RANGES[test]
+        label = max(parser_tool.tests[test], key=len).title()  # longest alias reads most like a report
+        rows.append((label, f"{rng.uniform(low, high):.1f}", f"{low} - {high}"))
+    return rows
+
+
+def page_image(rows, title, dpi=150):
+    img = Image.new("L", (int(8.27 * dpi), int(11.69 * dpi)), 250)
+    d = ImageDraw.Draw(img)
+    font = ImageFont.load_default(size=dpi // 6)
+    d.text((dpi, dpi), title, fill=0, font=font)
+    for i, (label, value, ref) in enumerate(rows):
+        y = int(dpi * 1.6) + i * dpi // 3
+        d.text((dpi, y), label, fill=0, font=font)
+        d.text((dpi * 4, y), value, fill=0, font=font)
+        d.text((dpi * 5, y), ref, fill=0, font=font)
+    return img
+
+
+def make_fixture(out_dir, variant, pages, analytes, seed=0):
+    """Write one synthetic report; returns its path."""
+    rng = random.Random(f"{variant}-{pages}-{analytes}-{seed}")
+    path = os.path.join(out_dir, f"{variant}_p{pages}_a{analytes}" + (".png" if variant == "image" else ".pdf"))
+    if variant == "image":
+        page_image(report_rows(analytes, rng), "LAB REPORT").save(path, dpi=(150, 150))
+        return path
+
+    doc = fitz.open()
+    for p in range(pages):
+        rows = report_rows(analytes, rng)
+        page = doc.new_page(width=595, height=842)
+        if variant == "text_pdf":
+            page.insert_text((60, 60), f"LAB REPORT - page {p + 1}", fontsize=12)
+            for i, (label, value, ref) in enumerate(rows):
+                for x, cell in zip((60, 260, 340), (label, value, ref)):
+                    page.insert_text((x, 100 + i * 18), cell, fontsize=10)
+        else:
+            tmp = os.path.join(out_dir, "page.png")
+            page_image(rows, f"LAB REPORT - page {p + 1}").save(tmp)
+            page.insert_image(page.rect, filename=tmp)
+            os.remove(tmp)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+#################
+# Measurement
+#################
+def percentile(sorted_values, q):
+    # nearest-rank
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def measure(fn, iterations, pages=1, setup=None):
+    """Run fn() `iterations` times (+1 traced run); return timing/memory stats.
+
+    Failed iterations are left out of the timings (a stage that fails fast
+    would otherwise look fast) and counted per exception type in "errors";
+    the timing fields are None when every iteration failed.
+    """
+    times, errors = [], {}
+    for _ in range(iterations):
+        if setup:
+            setup()
+        t = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            continue
+        times.append(time.perf_counter() - t)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+    except Exception:
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    times.sort()
+    total = sum(times)
+    return {
+        "iterations": iterations,
+        "errors": errors,
+        "throughput_per_s": len(times) / total if total else None,
+        "pages_per_s": len(times) * pages / total if total else None,
+        "mean_ms": total / len(times) * 1000 if times else None,
+        "p50_ms": percentile(times, 0.50) * 1000 if times else None,
+        "p95_ms": percentile(times, 0.95) * 1000 if times else None,
+        "peak_kib": peak / 1024,
+    }
+
+
+class StageFailed(Exception):
+    """A stage returned an {"error": ...} result instead of raising."""
+
+
+def ocr_pages(ocr, path):
+    # OCRTool.run() turns failures into an "... Error:" string and blanks
+    # timed-out pages; iter_results raises, and timeouts are raised here
+    timings = [t for _, t in ocr.iter_results(path)]
+    timeouts = sum("timeout" in t for t in timings)
+    if timeouts:
+        raise PageTimeout(f"OCR timed out on {timeouts} of {len(timings)} page(s)")
+
+
+def checked(result):
+    summary = result.get("summary", result)  # full_report nests the summary
+    if "error" in summary:
+        raise StageFailed(summary["error"])
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def bench_fixture(path, variant, pages, analytes, iterations, workers):
+    # imported here: these create their memory/ singletons on import, which
+    # must happen inside the scratch directory
+    from tools.ocr_cache import ocr_cache
+    from tools.patient_store import PatientStore, patient_store
+    from agents.summary_agent import SummaryAgent
+    from agents.orchestrator import HealthAgentOrchestrator
+
+    ocr = OCRTool(workers=workers)
+    text = ocr.run(path)
+    ocr_error = text if text.startswith(("PDF Error:", "Image Error:")) else None
+    if ocr_error:
+        print(f"  ! {os.path.basename(path)}: {ocr_error}")
+    data = parser_tool.parse(text)
+    pid = f"bench_{variant}_{pages}_{analytes}"
+    patient_store.append_history(pid, data)  # what summary.run() reads
+
+    store = PatientStore(os.path.join("memory", f"{pid}.db"))
+    summary = SummaryAgent()
+    orchestrator = HealthAgentOrchestrator()
+
+    def clear_ocr_cache():
+        # the full pipeline should OCR every time, not hit the cache
+        shutil.rmtree(ocr_cache.cache_dir, ignore_errors=True)
+        os.makedirs(ocr_cache.cache_dir, exist_ok=True)
+
+    stages = {
+        "ocr": (lambda: ocr_pages(ocr, path), pages, None),
+        "parse": (lambda: parser_tool.parse(text), pages, None),
+        "summary": (lambda: checked(summary.run(pid)), 1, None),
+        "history_write": (lambda: store.append_history(pid, data), 1, None),
+        "history_read": (lambda: store.load_history(pid), 1, None),
+        "full_report": (lambda: checked(orchestrator.run("full_report", file_path=path, patient_id=pid)),
+                        pages, clear_ocr_cache),
+    }
+    results = []
+    for stage, (fn, n_pages, setup) in stages.items():
+        r = measure(fn, iterations, n_pages, setup)
+        results.append({"stage": stage, "variant": variant, "pages": pages, "analytes": analytes,
+                        "parsed_analytes": len(data), "ocr_error": ocr_error, **r})
+        failed = ", ".join(f"{name} x{n}" for name, n in r["errors"].items())
+        if r["p50_ms"] is None:
+            print(f"  {stage:<14} every iteration failed: {failed}")
+            continue
+        print(f"  {stage:<14} p50 {r['p50_ms']:9.2f} ms  p95 {r['p95_ms']:9.2f} ms  "
+              f"peak {r['peak_kib']:9.1f} KiB" + (f"  ! failed: {failed}" if failed else ""))
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["stage"], r["variant"], r["pages"], r["analytes"]): r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path} (p50 change, + = slower)")
+    for r in results:
+        old = baseline.get((r["stage"], r["variant"], r["pages"], r["analytes"]))
+        if old and old["p50_ms"] and r["p50_ms"] is not None:
+            change = (r["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100
+            print(f"  {r['stage']:<14} {r['variant']:<12} p{r['pages']:<4} a{r['analytes']:<3} {change:+7.1f}%")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--variants", default=",".join(VARIANTS), help="subset of: " + ", ".join(VARIANTS))
+    ap.add_argument("--pages", default="1,10,100", help="page counts (images are always 1 page)")
+    ap.add_argument("--analytes", default="5,20", help="analytes per page")
+    ap.add_argument("--iterations", type=int, default=5)
+    ap.add_argument("--workers", type=int, default=None, help="OCR workers (default: one per core)")
+    ap.add_argument("--llm-latency", type=float, default=0.0, help="seconds the stub LLM waits per call")
+    ap.add_argument("--out", default="benchmark_results.json")
+    ap.add_argument("--compare", help="earlier results file to diff against")
+    args = ap.parse_args()
+
+    out = os.path.abspath(args.out)
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    workdir = tempfile.mkdtemp(prefix="healthbuddy_bench_")
+    os.chdir(workdir)  # agents keep their memory/ relative to the cwd
+    os.makedirs("memory", exist_ok=True)
+
+    from tools.llm_client import llm_client, StubBackend
+    llm_client.backend = StubBackend(latency=args.llm_latency)
+    llm_client.cache = None  # every call pays the (stub) LLM round trip
+
+    results = []
+    try:
+        for variant in args.variants.split(","):
+            page_counts = [1] if variant == "image" else [int(p) for p in args.pages.split(",")]
+            for pages in page_counts:
+                for analytes in (int(a) for a in args.analytes.split(",")):
+                    path = make_fixture(workdir, variant, pages, analytes)
+                    print(f"{variant} pages={pages} analytes={analytes}")
+                    results += bench_fixture(path, variant, pages, analytes, args.iterations, args.workers)
+    finally:
+        os.chdir(HERE)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(results)} results to {out}")
+    if baseline:
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
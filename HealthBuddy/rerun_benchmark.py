@@ -0,0 +1,118 @@
+"""Rerun latency of streamlit_app.py, measured headlessly with AppTest.
+
+    python rerun_benchmark.py                    # 20 reruns per scenario
+    python rerun_benchmark.py --reruns 50 --history 500 --json reruns.json
+
+Each scenario does one cold run and then reruns the script the way a
+click or chat message does. For the reruns we report p50/p95 of the
+script time the app records itself (last_rerun_ms, the number shown in
+the Diagnostics panel) and of the wall time, which includes AppTest's
+own polling. The app runs in a scratch directory against a seeded patient
+with --history reports and the stub LLM, so the real memory/ store is
+never touched and nothing leaves the box.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import time
+
+os.environ.setdefault("HEALTHBUDDY_LLM_BACKEND", "stub")
+
+from streamlit.testing.v1 import AppTest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def seed(patient_id, reports):
+    # imported here: the store is created on import, inside the scratch directory
+    from tools.patient_store import patient_store
+
+    rng = random.Random(0)
+    for i in range(reports):
+        ts = f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T{i % 24:02d}:00:00.{i:06d}"
+        data = {"hemoglobin": {"value": round(rng.uniform(9, 16), 1), "unit": "g/dl"},
+                "tsh": {"value": round(rng.uniform(0.5, 7), 2), "unit": "uIU/ml"},
+                "vitamin_d": {"value": round(rng.uniform(8, 60), 1), "unit": "ng/ml"}}
+        summary = {"english_summary": f"Report {i}: hemoglobin {data['hemoglobin']['value']} g/dl.",
+                   "hindi_summary": "-", "doctor_note": "-"}
+        patient_store.append_history(patient_id, data, timestamp=ts)
+        patient_store.save_summary(patient_id, data, summary, ["Drink water"], timestamp=ts)
+
+
+def percentile(sorted_values, q):
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+def timed(fn):
+    t = time.perf_counter()
+    fn()
+    return time.perf_counter() - t
+
+
+def scenario(name, patient_id, reruns, setup):
+    at = AppTest.from_file(os.path.join(HERE, "streamlit_app.py"), default_timeout=60)
+    cold = timed(at.run)
+    at.sidebar.text_input[0].set_value(patient_id)
+    setup(at)
+    at.run()
+    walls, scripts = [], []
+    for _ in range(reruns):
+        walls.append(timed(at.run) * 1000)
+        scripts.append(at.session_state["last_rerun_ms"])
+    if at.exception:
+        print(f"  ! {name}: {at.exception[0].message}")
+    walls.sort()
+    scripts.sort()
+    return {"scenario": name, "cold_ms": cold * 1000, "reruns": reruns,
+            "script_p50_ms": percentile(scripts, 0.5), "script_p95_ms": percentile(scripts, 0.95),
+            "wall_p50_ms": percentile(walls, 0.5), "wall_p95_ms": percentile(walls, 0.95)}
+
+
+def show_dashboard(at):
+    # a report is on screen: extracted table, summary, tips, trends and chat panel
+    history = at.session_state
+    history["extracted_data"] = {"hemoglobin": {"value": 11.2, "unit": "g/dl"}, "tsh": {"value": 5.1}}
+    history["summary_data"] = {"english_summary": "-", "hindi_summary": "-", "doctor_note": "-"}
+    history["health_tips"] = ["Drink water"]
+    history["processing_complete"] = True
+
+
+def show_history(at):
+    at.sidebar.radio[0].set_value("Advanced History")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--reruns", type=int, default=20)
+    ap.add_argument("--history", type=int, default=200, help="reports in the seeded patient's history")
+    ap.add_argument("--json", help="also write results to this file")
+    args = ap.parse_args()
+
+    out = os.path.abspath(args.json) if args.json else None
+    workdir = tempfile.mkdtemp(prefix="healthbuddy_rerun_")
+    os.chdir(workdir)  # the app keeps memory/ and data/ relative to the cwd
+    try:
+        seed("bench", args.history)
+        results = [
+            scenario("dashboard", "bench", args.reruns, show_dashboard),
+            scenario("history", "bench", args.reruns, show_history),
+        ]
+    finally:
+        os.chdir(HERE)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'scenario':<10} {'cold ms':>9} {'script p50':>11} {'script p95':>11} {'wall p50':>9} {'wall p95':>9}")
+    for r in results:
+        print(f"{r['scenario']:<10} {r['cold_ms']:>9.1f} {r['script_p50_ms']:>11.2f} {r['script_p95_ms']:>11.2f} "
+              f"{r['wall_p50_ms']:>9.1f} {r['wall_p95_ms']:>9.1f}")
+    if out:
+        with open(out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,20 @@
 import streamlit as st
-import json, os, time
-import pandas as pd
-from datetime import datetime
-
-# Gemini
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+import os, time
 
 # Agents
-from agents.ingest_agent import IngestAgent
-from agents.summary_agent import SummaryAgent
 from agents.chat_agent import ChatAgent
+from agents.job_queue import job_queue
+from tools.lab_model import LabPanel
+from tools.lazy_import import lazy_import
+from tools.patient_store import patient_store
+from tools.tracing import tracer
+
+pd = lazy_import("pandas")  # only the dashboard tables need it
+
+rerun_start = time.perf_counter()
+
+# keep memory/metrics.prom + memory/traces.json current for local scraping
+tracer.export_dir = "memory"
 
 #############################################
 # 0. SESSION STATE INIT
@@ -29,7 +30,7 @@ session_defaults = {
     "chat_history": [],
     "detected_name": None,
     "last_file": None,
-    "gemini_configured": False,
+    "job_id": None,
     "current_view": "Summarizer Dashboard"  # Navigation control variable
 }
 for k, v in session_defaults.items():
@@ -149,75 +150,78 @@ def flatten_json_to_df(data):
     return pd.DataFrame(out.items(), columns=["Parameter", "Result"]) if out else pd.DataFrame()
 
 
-def configure_gemini_once():
-    """Load Google AI Studio API key"""
-    if not GEMINI_AVAILABLE:
-        return
-    if not st.session_state["gemini_configured"]:
-        key = os.getenv("GEMINI_API_KEY")
-        if key:
-            genai.configure(api_key=key)
-            st.session_state["gemini_configured"] = True
+def extracted_to_df(data):
+    """Dashboard table of parsed results (one column per LabResult field)."""
+    try:
+        results = list(LabPanel.load(data))
+    except (ValueError, TypeError, AttributeError):
+        return flatten_json_to_df(data)  # free-form legacy record
+    if not results:
+        return pd.DataFrame()
+    return pd.DataFrame({
+        "Parameter": [r.test.upper().replace("_", " ") for r in results],
+        "Result": [r.value for r in results],
+        "Unit": [r.unit.value for r in results],
+        "Reference": [r.reference_range or "" for r in results],
+        "Flag": [r.flag for r in results],
+    })
+
+
+def trends_to_df(trends):
+    rows = []
+    for t in trends:
+        slope = t["slope_per_day"]
+        rows.append({
+            "Parameter": t["analyte"].upper().replace("_", " "),
+            "Last": t["last"],
+            "Previous": t["previous"],
+            "Avg (rolling)": round(t["rolling_mean"], 2),
+            "Min / Max": f"{t['min']} / {t['max']}",
+            "Trend / 30d": "" if slope is None else f"{slope * 30:+.2f}",
+            "Reports": t["count"],
+        })
+    return pd.DataFrame(rows)
+
+
+def trace_to_df(trace):
+    """Stage breakdown of one request; same-name siblings (e.g. OCR pages) are merged."""
+    rows = []
+
+    def walk(spans, depth):
+        groups = {}
+        for s in spans:
+            groups.setdefault(s["name"], []).append(s)
+        for name, group in groups.items():
+            rows.append({
+                "Stage": "\u2003" * depth + name + (f" ×{len(group)}" if len(group) > 1 else ""),
+                "ms": round(sum(s["seconds"] for s in group) * 1000, 1),
+                "self ms": round(sum(s["self_seconds"] for s in group) * 1000, 1),
+                "": next((s["error"] for s in group if s["error"]), "")
+                    or ("cache " + group[0]["attrs"]["cache"] if "cache" in group[0]["attrs"] else ""),
+            })
+            walk([c for s in group for c in s["children"]], depth + 1)
+
+    walk([trace], 0)
+    return pd.DataFrame(rows)
+
 
 #############################################
-# 5. GEMINI HEALTH TIPS 
+# 5. SHARED AGENTS
 #############################################
-def generate_health_tips_with_gemini(extracted, summary):
-    if not GEMINI_AVAILABLE:
-        return ["Gemini SDK install nahi hai."]
-
-    configure_gemini_once()
-
-    prompt = f"""
-    Based on the following blood/lab report:
-    LAB DATA: {json.dumps(extracted, ensure_ascii=False)}
-    SUMMARY: {json.dumps(summary, ensure_ascii=False)}
+# Streamlit reruns this whole script on every click. The agents are thin,
+# stateless handles: the parser/threshold tables, Gemini model handles and
+# LLM cache behind them are module-level singletons, so nothing heavy is
+# rebuilt per rerun. The orchestrator is the job queue's own, so uploads
+# and history views share one set.
+orchestrator = job_queue.orchestrator
+chat_agent = ChatAgent()
 
-    Generate 5–8 helpful, SAFE, Hinglish health tips.
-    Format MUST be bullet list starting with "-".
-    """
 
-    try:
-        # Step 1: Auto-detect available models
-        available_model = None
-        try:
-            for m in genai.list_models():
-                if 'generateContent' in getattr(m, "supported_generation_methods", []):
-                    # Prefer flash or pro
-                    if 'flash' in m.name:
-                        available_model = m.name
-                        break
-                    if 'pro' in m.name and not available_model:
-                        available_model = m.name
-        except Exception:
-            pass  # ignore list_models issues
-
-        # Fallback list agar auto-detect fail ho
-        candidates = [available_model] if available_model else []
-        candidates += ["gemini-1.5-flash", "gemini-1.5-flash-latest", "gemini-pro", "gemini-1.0-pro"]
-        candidates = list(dict.fromkeys([c for c in candidates if c]))  # unique, remove None
-
-        last_error = ""
-
-        for model_name in candidates:
-            try:
-                model = genai.GenerativeModel(model_name)
-                response = model.generate_content(prompt)
-                if response and getattr(response, "text", None):
-                    text = response.text.strip()
-                    tips = []
-                    for ln in text.splitlines():
-                        if ln.startswith("-") or ln.startswith("•"):
-                            tips.append(ln.lstrip("-• ").strip())
-                    return tips or [text]
-            except Exception as e:
-                last_error = str(e)
-                continue
-
-        return [f"Tips generate nahi ho paye. Last Error: {last_error}"]
-
-    except Exception as e:
-        return [f"Critical Gemini Error: {e}"]
+#############################################
+# 6. GEMINI HEALTH TIPS 
+#############################################
+def generate_health_tips_with_gemini(extracted, summary):
+    return orchestrator.tips.generate(extracted, summary)
 
 #############################################
 # Sidebar 
@@ -245,13 +249,26 @@ with st.sidebar:
 
     nav = st.session_state["current_view"]
 
+    # Per-request stage timings (see tools/tracing.py)
+    with st.expander("🛠 Diagnostics"):
+        if "last_rerun_ms" in st.session_state:
+            st.caption(f"Last rerun: {st.session_state['last_rerun_ms']:.1f} ms")
+        # the expander body runs on every rerun even when collapsed, so the
+        # stage tables are only built on request
+        n_traces = st.slider("Last requests", 1, 20, 5)
+        if st.toggle("Show stage timings"):
+            traces = tracer.recent(n_traces)
+            if not traces:
+                st.caption("No requests traced yet.")
+            for trace in traces:
+                when = time.strftime("%H:%M:%S", time.localtime(trace["start"]))
+                st.markdown(f"**{trace['name']}** · {trace['seconds']:.2f}s · {when}")
+                st.dataframe(trace_to_df(trace), hide_index=True, use_container_width=True)
+        st.download_button("⬇ metrics.prom", tracer.to_prometheus(), file_name="metrics.prom")
+
 #############################################
 # MAIN DASHBOARD
 #############################################
-ingest_agent = IngestAgent()
-summary_agent = SummaryAgent()
-chat_agent = ChatAgent()
-
 if nav == "Summarizer Dashboard":
 
     st.markdown('<h1 class="gradient-text">AI Medical Report Summarizer</h1>', unsafe_allow_html=True)
@@ -266,43 +283,38 @@ if nav == "Summarizer Dashboard":
         path = f"data/{uploaded.name}"
         os.makedirs("data", exist_ok=True)
 
-        pb = st.progress(0)
-        for p in range(0, 101, 20):
-            time.sleep(0.1)
-            pb.progress(p)
-
         with open(path, "wb") as f:
             f.write(uploaded.read())
         st.session_state.last_file = uploaded.name
 
-        with st.status("Processing report...", expanded=True):
-            raw = ingest_agent.run(path, patient_id)
-            summary = summary_agent.run(patient_id)
-            tips = generate_health_tips_with_gemini(raw, summary)
+        # OCR + summary + tips run on the background job queue
+        st.session_state.job_id = job_queue.submit(path, patient_id)
+        st.rerun()
 
-            st.session_state.extracted_data = raw
-            st.session_state.summary_data = summary
-            st.session_state.health_tips = tips
+    # Poll the running job (if any)
+    if st.session_state.job_id:
+        job = job_queue.status(st.session_state.job_id)
+
+        if job and job["status"] in ("queued", "running"):
+            st.progress(job["progress"], text=f"Processing report... {job['stage'] or job['status']}")
+            if st.button("✖ Cancel"):
+                job_queue.cancel(job["id"])
+            time.sleep(0.5)
+            st.rerun()
+
+        st.session_state.job_id = None
+        if not job:
+            st.error("Processing job not found.")
+        elif job["status"] == "done":
+            report = job["result"]
+            st.session_state.extracted_data = report["extracted"]
+            st.session_state.summary_data = report["summary"]
+            st.session_state.health_tips = report["tips"]
             st.session_state.processing_complete = True
-
-            # ==========================
-            # SAVE HISTORY TO PATIENT FOLDER (CORRECT PLACE)
-            # ==========================
-            patient_folder = f"memory/{patient_id}"
-            os.makedirs(patient_folder, exist_ok=True)
-
-            record = {
-                "timestamp": datetime.now().strftime("%d-%m-%Y %H:%M:%S"),
-                "extracted_data": raw,
-                "summary": summary,
-                "health_tips": tips
-            }
-
-            filename = f"{patient_folder}/{int(time.time())}.json"
-            with open(filename, "w") as fp:
-                json.dump(record, fp, indent=2)
-
-        st.rerun()
+        elif job["status"] == "failed":
+            st.error(f"Processing failed: {job['error']}")
+        else:
+            st.warning("Processing cancelled.")
 
     # Display Dashboard if data exists
     if st.session_state.processing_complete and st.session_state.extracted_data:
@@ -320,7 +332,7 @@ if nav == "Summarizer Dashboard":
             with a:
                 st.markdown('<div class="css-card">', unsafe_allow_html=True)
                 st.subheader("📊 Extracted Data")
-                df = flatten_json_to_df(st.session_state.extracted_data)
+                df = extracted_to_df(st.session_state.extracted_data)
                 st.dataframe(df, hide_index=True, use_container_width=True)
                 st.markdown('</div>', unsafe_allow_html=True)
 
@@ -354,6 +366,17 @@ if nav == "Summarizer Dashboard":
             )
             st.markdown('</div>', unsafe_allow_html=True)
 
+            # Trends (precomputed per-analyte aggregates, no history scan)
+            trends = patient_store.trends(patient_id)
+            if trends:
+                st.markdown('<div class="css-card">', unsafe_allow_html=True)
+                st.subheader("📈 Trends")
+                for t in trends:
+                    if t["alert"]:
+                        st.warning(t["alert"])
+                st.dataframe(trends_to_df(trends), hide_index=True, use_container_width=True)
+                st.markdown('</div>', unsafe_allow_html=True)
+
         ###################################
         # RIGHT CHAT 
         ###################################
@@ -377,15 +400,12 @@ if nav == "Summarizer Dashboard":
                     "tips": st.session_state.health_tips
                 }
 
-                final_prompt = (
-                    f"User Query: {msg}\n\n"
-                    f"Use this report context:\n{json.dumps(ctx, ensure_ascii=False)}\n\n"
-                    f"Never ask user to upload report again."
-                )
-
-                ans = chat_agent.run(patient_id, final_prompt)
+                # render the answer token by token instead of a full rerun;
+                # Streamlit's Stop button cancels it (partial answer is kept)
+                with chat_box:
+                    st.markdown(f"<div class='chat-bubble user'>{msg}</div>", unsafe_allow_html=True)
+                    ans = st.write_stream(chat_agent.stream(patient_id, msg, context=ctx))
                 st.session_state.chat_history.append({"role": "assistant", "content": ans})
-                st.rerun()
 
             st.markdown('</div>', unsafe_allow_html=True)
 
@@ -393,73 +413,81 @@ if nav == "Summarizer Dashboard":
         st.info("👆 Please upload a medical report to start.")
 
 #############################################
-# HISTORY PAGE (Patient-based Folder Storage)
+# HISTORY PAGE (Patient Store)
 #############################################
 else:
     st.markdown('<h2 class="gradient-text">📂 Patient History</h2>', unsafe_allow_html=True)
 
-    # Patient-specific folder
-    patient_folder = f"memory/{patient_id}"
-    os.makedirs(patient_folder, exist_ok=True)
+    PAGE_SIZE = 10
+    total = patient_store.count_summaries(patient_id)
 
-    # List JSON files
-    history_files = sorted(
-        [f for f in os.listdir(patient_folder) if f.endswith(".json")],
-        reverse=True
-    )
-
-    if not history_files:
+    if not total:
         st.warning("No history found for this patient.")
     else:
-        for i, file in enumerate(history_files):
-            fullpath = os.path.join(patient_folder, file)
-
-            try:
-                entry = json.load(open(fullpath))
-
-                ts = entry.get("timestamp", file.replace(".json", ""))
-                extracted = entry.get("extracted_data", {})
-                summary = entry.get("summary", {})
-                tips = entry.get("health_tips", [])
-
-                eng_summary = summary.get("english_summary", "No summary available")
-                preview = eng_summary[:150] + "..."
-
-                # Display summary card
-                st.markdown(f"""
-                <div class="history-item" style="
-                    background: rgba(255,255,255,0.08);
-                    padding: 15px; 
-                    margin-bottom: 12px;
-                    border-radius: 12px;
-                    border: 1px solid rgba(255,255,255,0.15);">
-                    
-                    <h4>📅 {ts}</h4>
-                    <p style='opacity:0.85'>{preview}</p>
-                </div>
-                """, unsafe_allow_html=True)
-
-                # View button
-                if st.button(f"🔎 View Full Report ({ts})", key=f"history_{i}"):
-
-                    # Load saved data into current session
-                    st.session_state.extracted_data = extracted
-                    st.session_state.summary_data = summary
-
-                    # Auto-generate tips if missing
-                    if not tips:
-                        with st.spinner("Generating health tips..."):
-                            tips = generate_health_tips_with_gemini(extracted, summary)
-
-                    st.session_state.health_tips = tips
-                    st.session_state.processing_complete = True
-
-                    # Reset chat for new report
-                    st.session_state.chat_history = []
-
-                    # Redirect to Dashboard
-                    st.session_state["current_view"] = "Summarizer Dashboard"
-                    st.rerun()
-
-            except Exception as e:
-                st.error(f"Error reading history file {file}: {e}")
+        pages = (total + PAGE_SIZE - 1) // PAGE_SIZE
+        page = min(st.session_state.get("history_page", 0), pages - 1)
+
+        # Only the index rows of the visible page are read from the store
+        for entry in patient_store.list_summary_page(patient_id, page, PAGE_SIZE):
+            ts = entry["timestamp"].replace("T", " ")[:19]
+            preview = entry["preview"]
+
+            # Display summary card
+            st.markdown(f"""
+            <div class="history-item" style="
+                background: rgba(255,255,255,0.08);
+                padding: 15px; 
+                margin-bottom: 12px;
+                border-radius: 12px;
+                border: 1px solid rgba(255,255,255,0.15);">
+                
+                <h4>📅 {ts}</h4>
+                <p style='opacity:0.85'>{preview}</p>
+            </div>
+            """, unsafe_allow_html=True)
+
+            # View button
+            if st.button(f"🔎 View Full Report ({ts})", key=f"history_{entry['id']}"):
+
+                # Full record is loaded only now
+                record = patient_store.load_summary(entry["id"])
+                extracted = record["extracted_data"]
+                summary = record["summary"]
+                tips = record["health_tips"]
+
+                # Load saved data into current session
+                st.session_state.extracted_data = extracted
+                st.session_state.summary_data = summary
+
+                # Auto-generate tips if missing
+                if not tips:
+                    with st.spinner("Generating health tips..."):
+                        tips = generate_health_tips_with_gemini(extracted, summary)
+
+                st.session_state.health_tips = tips
+                st.session_state.processing_complete = True
+
+                # Reset chat for new report
+                st.session_state.chat_history = []
+
+                # Redirect to Dashboard
+                st.session_state["current_view"] = "Summarizer Dashboard"
+                st.rerun()
+
+        # Pager
+        p1, p2, p3 = st.columns([1, 2, 1])
+        with p1:
+            if st.button("⬅️ Newer", disabled=page == 0):
+                st.session_state["history_page"] = page - 1
+                st.rerun()
+        with p2:
+            st.caption(f"Page {page + 1} of {pages} · {total} reports")
+        with p3:
+            if st.button("Older ➡️", disabled=page >= pages - 1):
+                st.session_state["history_page"] = page + 1
+                st.rerun()
+
+# Script time of this rerun (widgets to last element); shown in Diagnostics
+rerun_seconds = time.perf_counter() - rerun_start
+tracer.observe("healthbuddy_rerun_seconds", rerun_seconds, view=nav)
+st.session_state["last_rerun_ms"] = rerun_seconds * 1000
@@ -0,0 +1,294 @@
+import functools
+import json
+import math
+import os
+import re
+import struct
+import sys
+from array import array
+from enum import Enum
+
+MAGIC = b"HBLP\x01"  # HealthBuddy lab panel, format version 1
+NUMBER_RE = re.compile(r"[0-9]+\.?[0-9]*")
+FLAGS = ("", "Low", "High")
+
+
+class Unit(str, Enum):
+    """Canonical units; parsed spellings are mapped here by Unit.parse()."""
+    NONE = ""
+    G_DL = "g/dL"
+    MG_DL = "mg/dL"
+    NG_ML = "ng/mL"
+    PG_ML = "pg/mL"
+    IU_L = "IU/L"
+    MIU_ML = "mIU/mL"
+    UIU_ML = "µIU/mL"
+    PERCENT = "%"
+    PER_UL = "/uL"
+    CELLS_UL = "cells/uL"
+
+    @classmethod
+    def parse(cls, text):
+        """Unit for a parsed/stored spelling ("g/dl", OCR's "mlu/ml", ...); ValueError if unknown."""
+        if isinstance(text, cls):
+            return text
+        key = (text or "").strip().lower()
+        try:
+            return _UNIT_ALIASES[key]
+        except KeyError:
+            raise ValueError(f"unknown unit {text!r}") from None
+
+
+_UNIT_ALIASES = {u.value.lower(): u for u in Unit}
+_UNIT_ALIASES.update({"mlu/ml": Unit.MIU_ML, "uiu/ml": Unit.UIU_ML, "iu/ml": Unit.MIU_ML})
+_UNIT_CODES = {u: i for i, u in enumerate(Unit)}
+_UNITS = list(Unit)
+_UNIT_NAMES = [u.value for u in Unit]
+
+
+def _num(x):
+    # 150000.0 -> "150000", 0.4 -> "0.4"
+    return f"{x:.10g}"
+
+
+def parse_range(text):
+    """(low, high) from "12 - 16", "< 5" or "> 30"; missing bounds are None."""
+    if not text:
+        return None, None
+    text = str(text).strip()
+    nums = [float(n) for n in NUMBER_RE.findall(text)]
+    if not nums:
+        return None, None
+    if text[0] in "<≤":
+        return None, nums[0]
+    if text[0] in ">≥":
+        return nums[0], None
+    if len(nums) >= 2:
+        return nums[0], nums[1]
+    return None, None
+
+
+@functools.lru_cache(maxsize=4096)  # the same few ranges repeat across a history
+def format_range(low, high):
+    if low is not None and high is not None:
+        return f"{_num(low)} - {_num(high)}"
+    if high is not None:
+        return f"< {_num(high)}"
+    if low is not None:
+        return f"> {_num(low)}"
+    return None
+
+
+class LabResult:
+    """One test result with numeric reference bounds."""
+
+    __slots__ = ("test", "value", "unit", "flag", "low", "high")
+
+    def __init__(self, test, value=None, unit=Unit.NONE, flag="", low=None, high=None):
+        self.test = test
+        self.value = value
+        self.unit = unit
+        self.flag = flag
+        self.low = low
+        self.high = high
+
+    @property
+    def reference_range(self):
+        return format_range(self.low, self.high)
+
+    def status(self):
+        """Low/High/Normal against the report's own reference range ("" without one)."""
+        if self.value is None or (self.low is None and self.high is None):
+            return ""
+        if self.low is not None and self.value < self.low:
+            return "Low"
+        if self.high is not None and self.value > self.high:
+            return "High"
+        return "Normal"
+
+    def to_dict(self):
+        return {"value": self.value, "unit": self.unit.value, "flag": self.flag,
+                "reference_range": self.reference_range}
+
+    def __repr__(self):
+        return f"LabResult({self.test!r}, {self.value!r}, {self.unit.value!r}, {self.flag!r}, {self.low!r}, {self.high!r})"
+
+
+class LabPanel:
+    """The results of one report, stored column-wise.
+
+    Values and bounds are float arrays (NaN = missing), units and flags one
+    byte each, so a panel costs a few dozen bytes per test instead of a
+    dict per test, and to_bytes() is the same columns back to back. Adding
+    a test that is already present replaces it (like the parser's dict).
+    """
+
+    __slots__ = ("tests", "values", "lows", "highs", "units", "flags")
+
+    def __init__(self):
+        self.tests = []
+        self.values = array("d")
+        self.lows = array("d")
+        self.highs = array("d")
+        self.units = bytearray()
+        self.flags = bytearray()
+
+    def add(self, test, value=None, unit=Unit.NONE, flag="", low=None, high=None):
+        row = (
+            math.nan if value is None else float(value),
+            math.nan if low is None else float(low),
+            math.nan if high is None else float(high),
+            _UNIT_CODES[Unit.parse(unit)],
+            FLAGS.index(flag or ""),
+        )
+        try:
+            i = self.tests.index(test)
+        except ValueError:
+            self.tests.append(test)
+            self.values.append(row[0])
+            self.lows.append(row[1])
+            self.highs.append(row[2])
+            self.units.append(row[3])
+            self.flags.append(row[4])
+        else:
+            self.values[i], self.lows[i], self.highs[i], self.units[i], self.flags[i] = row
+
+    def add_info(self, test, info):
+        """Add a parser-style {"value", "unit", "flag", "reference_range"} dict."""
+        if not isinstance(info, dict):
+            raise ValueError(f"{test}: not a test result: {info!r}")
+        low, high = parse_range(info.get("reference_range"))
+        self.add(test, info.get("value"), info.get("unit"), info.get("flag"), low, high)
+
+    def __len__(self):
+        return len(self.tests)
+
+    def __contains__(self, test):
+        return test in self.tests
+
+    def __iter__(self):
+        for i in range(len(self.tests)):
+            yield self[i]
+
+    def __getitem__(self, i):
+        value, low, high = self.values[i], self.lows[i], self.highs[i]
+        return LabResult(
+            self.tests[i],
+            None if math.isnan(value) else value,
+            _UNITS[self.units[i]],
+            FLAGS[self.flags[i]],
+            None if math.isnan(low) else low,
+            None if math.isnan(high) else high,
+        )
+
+    def get(self, test):
+        try:
+            return self[self.tests.index(test)]
+        except ValueError:
+            return None
+
+    ###########################
+    # Conversion
+    ###########################
+    @classmethod
+    def from_items(cls, items):
+        """From (test, info) pairs, e.g. ParserTool.parse_iter()."""
+        panel = cls()
+        for test, info in items:
+            panel.add_info(test, info)
+        return panel
+
+    @classmethod
+    def from_dict(cls, data):
+        """From the parser's {test: info} dict; ValueError if it is not one."""
+        return cls.from_items(data.items())
+
+    def to_dict(self):
+        # straight from the columns (no LabResult per test): this is the hot
+        # path when a long history is loaded as dicts
+        out = {}
+        for test, value, low, high, unit, flag in zip(
+                self.tests, self.values, self.lows, self.highs, self.units, self.flags):
+            out[test] = {
+                "value": None if value != value else value,
+                "unit": _UNIT_NAMES[unit],
+                "flag": FLAGS[flag],
+                "reference_range": format_range(None if low != low else low, None if high != high else high),
+            }
+        return out
+
+    def _columns(self):
+        return self.values, self.lows, self.highs
+
+    def to_bytes(self):
+        n = len(self.tests)
+        names = "\n".join(self.tests).encode("utf-8")
+        parts = [MAGIC, struct.pack("<II", n, len(names)), names]
+        for column in self._columns():
+            if sys.byteorder == "big":  # stored little-endian
+                column = array("d", column)
+                column.byteswap()
+            parts.append(column.tobytes())
+        parts += [bytes(self.units), bytes(self.flags)]
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, buf):
+        if not buf.startswith(MAGIC):
+            raise ValueError("not a lab panel")
+        off = len(MAGIC)
+        n, names_len = struct.unpack_from("<II", buf, off)
+        off += 8
+        panel = cls()
+        panel.tests = buf[off:off + names_len].decode("utf-8").split("\n") if n else []
+        off += names_len
+        for column in panel._columns():
+            column.frombytes(buf[off:off + 8 * n])
+            if sys.byteorder == "big":
+                column.byteswap()
+            off += 8 * n
+        panel.units = bytearray(buf[off:off + n])
+        panel.flags = bytearray(buf[off + n:off + 2 * n])
+        return panel
+
+    @classmethod
+    def load(cls, raw):
+        """Panel from to_bytes() output, a JSON string or a {test: info} dict."""
+        if isinstance(raw, cls):
+            return raw
+        if isinstance(raw, (bytes, bytearray, memoryview)):
+            return cls.from_bytes(bytes(raw))
+        if isinstance(raw, str):
+            raw = json.loads(raw)
+        return cls.from_dict(raw)
+
+    ###########################
+    # Files
+    ###########################
+    def save(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.to_bytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def read(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+def encode_results(data):
+    """Storage form of extracted results: panel bytes, or JSON for anything
+    that is not a plain lab panel (legacy records with free-form fields)."""
+    try:
+        return LabPanel.load(data).to_bytes()
+    except (ValueError, TypeError, AttributeError):
+        return json.dumps(data, ensure_ascii=False)
+
+
+def decode_results(raw):
+    """{test: info} dict back from encode_results() output."""
+    if isinstance(raw, bytes):
+        return LabPanel.from_bytes(raw).to_dict()
+    return json.loads(raw)
+
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    # whitespace-only differences (indentation of f-string prompts etc.) hit the same entry
+    return " ".join(prompt.split())
+
+
+class LLMCache:
+    """Prompt/response cache: in-memory LRU with an optional on-disk tier.
+
+    Entries are keyed by model name + normalized prompt and expire after
+    `ttl` seconds. The memory tier holds at most `max_entries`; the disk
+    tier (one JSON file per entry, mtime = LRU clock) at most
+    `max_disk_entries`. The disk entries are counted as they are written,
+    so the directory is only listed when the count says it is over; it is
+    then trimmed to 90% of the limit, so that happens once per ~10% of
+    the limit in new writes rather than on every put.
+    """
+
+    def __init__(self, max_entries=512, ttl=24 * 3600, disk_dir=None, max_disk_entries=5000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self._mem = OrderedDict()  # key -> (expires_at, text)
+        self._lock = threading.Lock()
+        self._disk_count = None  # entries on disk, listed once on first write
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def key(model_name, prompt):
+        raw = f"{model_name}\0{normalize_prompt(prompt)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def get(self, model_name, prompt):
+        key = self.key(model_name, prompt)
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry and entry[0] > now:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._mem[key]
+
+        entry = self._disk_get(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+        # promoted with its stored expiry: reading an entry doesn't extend it
+        self._mem_put(key, *entry)
+        return entry[1]
+
+    def put(self, model_name, prompt, text):
+        key = self.key(model_name, prompt)
+        expires = time.time() + self.ttl
+        self._mem_put(key, expires, text)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"expires": expires, "text": text}, f, ensure_ascii=False)
+            new = not os.path.exists(path)
+            os.replace(tmp, path)
+            with self._lock:
+                if self._disk_count is None:
+                    self._disk_count = len(self._disk_names())
+                elif new:
+                    self._disk_count += 1
+                over = self._disk_count > self.max_disk_entries
+            if over:
+                self._disk_evict()
+
+    def _mem_put(self, key, expires, text):
+        with self._lock:
+            self._mem[key] = (expires, text)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+
+    def _disk_get(self, key, now):
+        """(expires_at, text) of a live disk entry, else None."""
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("expires", 0) <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        if entry.get("text") is None:
+            return None
+        os.utime(path)
+        return entry["expires"], entry["text"]
+
+    def _disk_names(self):
+        return [n for n in os.listdir(self.disk_dir) if n.endswith(".json")]
+
+    def _disk_evict(self):
+        # the listing also resyncs the count (other processes share the directory)
+        paths = [os.path.join(self.disk_dir, n) for n in self._disk_names()]
+        keep = len(paths)
+        if keep > self.max_disk_entries:
+            keep = int(self.max_disk_entries * 0.9)
+            paths.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+            for path in paths[: len(paths) - keep]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        with self._lock:
+            self._disk_count = keep
+
+    def clear(self):
+        """Drop every entry, in memory and on disk."""
+        with self._lock:
+            self._mem.clear()
+            self._disk_count = 0 if self.disk_dir else None
+        if self.disk_dir:
+            for name in self._disk_names():
+                try:
+                    os.remove(os.path.join(self.disk_dir, name))
+                except OSError:
+                    pass
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "entries": len(self._mem),
+        }
@@ -0,0 +1,244 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+from tools.llm_cache import LLMCache
+from tools.tracing import tracer
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+FALLBACK_MODELS = ["gemini-1.5-flash", "gemini-1.5-flash-latest", "gemini-pro", "gemini-1.0-pro"]
+
+
+class GeminiBackend:
+    """google.generativeai, configured once with model handles reused across calls."""
+
+    name = "gemini"
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key or os.environ.get("GEMINI_API_KEY")
+        self._genai = None
+        self._models = {}
+        self._discovered = None
+        self._lock = threading.Lock()
+
+    def available(self):
+        if not self.api_key:
+            return False
+        try:
+            self._client()
+            return True
+        except ImportError:
+            return False
+
+    def _client(self):
+        if self._genai is None:
+            with self._lock:
+                if self._genai is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    self._genai = genai
+        return self._genai
+
+    def model(self, name):
+        handle = self._models.get(name)
+        if handle is None:
+            handle = self._models[name] = self._client().GenerativeModel(name)
+        return handle
+
+    def discover_model(self):
+        """Best generateContent model for this key (flash > pro); list_models runs once."""
+        if self._discovered is None:
+            found = ""
+            try:
+                for m in self._client().list_models():
+                    if 'generateContent' in getattr(m, "supported_generation_methods", []):
+                        # Prefer flash or pro
+                        if 'flash' in m.name:
+                            found = m.name
+                            break
+                        if 'pro' in m.name and not found:
+                            found = m.name
+            except Exception:
+                pass  # ignore list_models issues
+            self._discovered = found
+        return self._discovered
+
+    def generate(self, prompt, model_name):
+        resp = self.model(model_name).generate_content(prompt)
+        return resp.text
+
+    def stream(self, prompt, model_name):
+        for chunk in self.model(model_name).generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+
+class StubBackend:
+    """Offline backend for tests/benchmarks. `reply` maps prompt -> text."""
+
+    name = "stub"
+
+    def __init__(self, reply=None, latency=0.0):
+        self.reply = reply or (lambda prompt: "- " + (prompt.strip().splitlines() or [""])[-1][:200])
+        self.latency = latency
+
+    def available(self):
+        return True
+
+    def discover_model(self):
+        return "stub"
+
+    def generate(self, prompt, model_name):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.reply(prompt)
+
+    def stream(self, prompt, model_name):
+        """Fake token stream: the reply word by word, `latency` spread over the words."""
+        words = self.reply(prompt).split(" ")
+        for i, word in enumerate(words):
+            if self.latency:
+                time.sleep(self.latency / len(words))
+            yield word if i == 0 else " " + word
+
+
+def default_backend():
+    if os.environ.get("HEALTHBUDDY_LLM_BACKEND", "gemini").lower() == "stub":
+        return StubBackend()
+    return GeminiBackend()
+
+
+class LLMClient:
+    """Shared entry point for every LLM call (summary, tips, chat).
+
+    Sync generate() and async agenerate() both go through the same
+    backend (model handles and model discovery are reused), with a cap on
+    concurrent in-flight requests and retry with exponential backoff.
+    Answers are cached per (model, prompt) so repeated prompts cost no
+    API call. Failures return "" so callers keep their rule-based
+    fallbacks.
+    """
+
+    def __init__(self, backend=None, max_concurrency=4, retries=2, backoff=0.5, cache=None):
+        self.backend = backend or default_backend()
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.last_error = ""
+        self._sem = threading.BoundedSemaphore(max_concurrency)
+        self._async_sems = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+
+    def available(self):
+        return self.backend.available()
+
+    def candidate_models(self):
+        """Discovered model first, then the static fallbacks (deduplicated)."""
+        models = [self.backend.discover_model()] + FALLBACK_MODELS
+        return list(dict.fromkeys(m for m in models if m))
+
+    def generate(self, prompt, models=None, use_cache=True):
+        with tracer.span("llm.generate", backend=getattr(self.backend, "name", ""), prompt_chars=len(prompt)) as span:
+            text = self._generate(prompt, models, use_cache, span)
+        tracer.count("healthbuddy_llm_requests_total", outcome=span.attrs["outcome"])
+        return text
+
+    def _generate(self, prompt, models, use_cache, span):
+        if not self.available():
+            span.set(outcome="unavailable")
+            return ""
+        models = models or [DEFAULT_MODEL]
+        use_cache = use_cache and self.cache is not None
+        if use_cache:
+            for model_name in models:
+                text = self.cache.get(model_name, prompt)
+                if text is not None:
+                    span.set(outcome="cache", model=model_name)
+                    return text
+
+        for model_name in models:
+            for attempt in range(self.retries):
+                try:
+                    with self._sem:
+                        text = self.backend.generate(prompt, model_name)
+                    if text:
+                        if use_cache:
+                            self.cache.put(model_name, prompt, text)
+                        span.set(outcome="ok", model=model_name, attempts=attempt + 1)
+                        return text
+                    break  # empty answer: try the next model
+                except Exception as e:
+                    self.last_error = str(e)
+                    if attempt + 1 < self.retries:
+                        time.sleep(self.backoff * (2 ** attempt))
+        span.set(outcome="failed")
+        return ""
+
+    def stream(self, prompt, models=None, use_cache=True):
+        """Yield the answer in chunks as the backend produces them.
+
+        Falls through models/retries only until the first chunk arrived;
+        a complete answer is cached like generate(). Yields nothing on
+        failure, so callers can fall back.
+        """
+        if not self.available():
+            self._stream_outcome("unavailable")
+            return
+        models = models or [DEFAULT_MODEL]
+        use_cache = use_cache and self.cache is not None
+        if use_cache:
+            for model_name in models:
+                text = self.cache.get(model_name, prompt)
+                if text is not None:
+                    self._stream_outcome("cache", model_name)
+                    yield text
+                    return
+
+        for model_name in models:
+            for attempt in range(self.retries):
+                chunks = []
+                try:
+                    with self._sem:
+                        for chunk in self.backend.stream(prompt, model_name):
+                            chunks.append(chunk)
+                            yield chunk
+                except Exception as e:
+                    self.last_error = str(e)
+                    if chunks:
+                        self._stream_outcome("partial", model_name)
+                        return  # partial answer already shown; don't restart it
+                    if attempt + 1 < self.retries:
+                        time.sleep(self.backoff * (2 ** attempt))
+                    continue
+                if chunks:
+                    if use_cache:
+                        self.cache.put(model_name, prompt, "".join(chunks))
+                    self._stream_outcome("ok", model_name)
+                    return
+                break  # empty answer: try the next model
+        self._stream_outcome("failed")
+
+    @staticmethod
+    def _stream_outcome(outcome, model_name=None):
+        # the caller's span (e.g. ChatAgent.stream's iter_span) is current while we produce
+        tracer.annotate(outcome=outcome, model=model_name)
+        tracer.count("healthbuddy_llm_requests_total", outcome=outcome)
+
+    def _async_sem(self):
+        loop = asyncio.get_running_loop()
+        sem = self._async_sems.get(loop)
+        if sem is None:
+            sem = self._async_sems[loop] = asyncio.Semaphore(self.max_concurrency)
+        return sem
+
+    async def agenerate(self, prompt, models=None, use_cache=True):
+        async with self._async_sem():
+            return await asyncio.to_thread(self.generate, prompt, models, use_cache)
+
+    async def agenerate_many(self, prompts, models=None, use_cache=True):
+        return await asyncio.gather(*(self.agenerate(p, models, use_cache) for p in prompts))
+
+
+llm_client = LLMClient(cache=LLMCache(disk_dir="memory/llm_cache"))
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import threading
+
+from tools.ocr_tool import ocr_tool
+from tools.tracing import tracer
+
+
+def file_hash(filepath, chunk_size=1 << 20):
+    """sha256 of the file bytes (streamed, so big PDFs are not read into memory)."""
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def tesseract_version():
+    try:
+        import pytesseract
+        return str(pytesseract.get_tesseract_version())
+    except Exception:
+        return "unknown"
+
+
+class OCRIncomplete(Exception):
+    """Some pages hit the OCR timeout, so the text is missing parts of the document."""
+
+
+def _timed_out(timings):
+    """Number of pages that came back empty because they hit the OCR timeout."""
+    return sum("timeout" in t for t in timings)
+
+
+class OCRCache:
+    """On-disk OCR result cache keyed by file content + OCR settings.
+
+    One plain-text file per entry (so hits can be streamed back line by
+    line); the file mtime doubles as the LRU clock (touched on every
+    hit), and the oldest entries are evicted once the directory grows
+    past max_bytes.
+    """
+
+    def __init__(self, tool=ocr_tool, cache_dir="memory/ocr_cache", max_bytes=200 * 1024 * 1024):
+        self.tool = tool
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._tesseract_version = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def settings_fingerprint(self):
+        if self._tesseract_version is None:
+            self._tesseract_version = tesseract_version()
+        return json.dumps({
+            "tesseract": self._tesseract_version,
+            **self.tool.settings(),
+        }, sort_keys=True)
+
+    def key(self, filepath):
+        h = hashlib.sha256(file_hash(filepath).encode())
+        h.update(self.settings_fingerprint().encode())
+        return h.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def get(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            return None
+        os.utime(path)  # mark as recently used
+        return text
+
+    def _tmp_path(self, key):
+        return f"{self._entry_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def put(self, key, text):
+        tmp = self._tmp_path(key)
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        self._commit(key, tmp)
+
+    def _commit(self, key, tmp):
+        os.replace(tmp, self._entry_path(key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".txt"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def run(self, filepath):
+        key = self.key(filepath)
+        text = self.get(key)
+        if text is not None:
+            self._hit()
+            return text
+
+        self._miss()
+        text, timings = self.tool.run_timed(filepath)
+        # don't cache failures ("PDF Error: ..." / "Image Error: ...") or
+        # pages that timed out: they might come through on the next try
+        if not text.startswith(("PDF Error:", "Image Error:")) and not _timed_out(timings):
+            self.put(key, text)
+        return text
+
+    def iter_pages(self, filepath):
+        """Streaming variant of run(): yields text chunks as they become available.
+
+        A hit is streamed straight from the cache file; a miss is teed to
+        a temp file page by page and only committed once OCR finished.
+        If any page timed out, OCRIncomplete is raised after the last page
+        (so a caller never stores a report with pages silently missing);
+        errors propagate to the caller and nothing is cached.
+        """
+        key = self.key(filepath)
+        path = self._entry_path(key)
+        try:
+            f = open(path, encoding="utf-8")
+        except OSError:
+            f = None
+        if f is not None:
+            self._hit()
+            os.utime(path)
+            with f:
+                yield from f
+            return
+
+        self._miss()
+        tmp = self._tmp_path(key)
+        timings = []
+        try:
+            with open(tmp, "w", encoding="utf-8") as out:
+                for page, page_timings in self.tool.iter_results(filepath):
+                    timings.append(page_timings)
+                    out.write(page)
+                    yield page
+        except BaseException:
+            # OCR failed or the consumer stopped early
+            self._discard(tmp)
+            raise
+        timeouts = _timed_out(timings)
+        if timeouts:
+            self._discard(tmp)
+            raise OCRIncomplete(f"OCR timed out on {timeouts} of {len(timings)} page(s)")
+        self._commit(key, tmp)
+
+    @staticmethod
+    def _discard(tmp):
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    def _hit(self):
+        self.hits += 1
+        tracer.count("healthbuddy_ocr_cache_total", result="hit")
+        tracer.annotate(cache="hit")
+
+    def _miss(self):
+        self.misses += 1
+        tracer.count("healthbuddy_ocr_cache_total", result="miss")
+        tracer.annotate(cache="miss")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+ocr_cache = OCRCache()
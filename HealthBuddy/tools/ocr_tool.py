@@ -1,36 +1,278 @@
-import pytesseract
-import fitz  # PyMuPDF
-from PIL import Image
+import math
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from tools.image_preprocess import ImagePreprocessor, TESSERACT_CONFIG, choose_dpi, scale_to_dpi
+from tools.pdf_layout import CELL_SEP, page_rows, rows_to_text, image_regions
+from tools.lazy_import import lazy_import
+from tools.tracing import tracer
+
+# heavy imports are deferred until a document is actually OCR'd
+pytesseract = lazy_import("pytesseract")
+fitz = lazy_import("fitz")  # PyMuPDF
+Image = lazy_import("PIL.Image")
+
+COLUMN_GAP_RE = re.compile(r"(?<=\S) {3,}(?=\S)")
+
+
+class PageTimeout(Exception):
+    """Tesseract hit page_timeout (pytesseract only raises a bare RuntimeError)."""
+
+
+def _lap(timings, stage, start):
+    now = time.perf_counter()
+    timings[stage] = timings.get(stage, 0.0) + now - start
+    return now
+
+
+def _ocr_image(img, preprocessor=None, config="", page_timeout=0, structured=False, timings=None):
+    timings = {} if timings is None else timings
+    t = time.perf_counter()
+    if preprocessor is not None:
+        img = preprocessor.run(img)
+        t = _lap(timings, "preprocess", t)
+    try:
+        text = pytesseract.image_to_string(img, config=config, timeout=page_timeout)
+    except RuntimeError as e:
+        if str(e) == "Tesseract process timeout":
+            raise PageTimeout(str(e)) from None
+        raise
+    _lap(timings, "tesseract", t)
+    if structured:
+        # preserve_interword_spaces keeps column gaps as runs of spaces
+        text = COLUMN_GAP_RE.sub(CELL_SEP, text)
+    return text
+
+
+def _render(page, preprocessor, dpi, clip=None):
+    # grayscale render when we preprocess anyway
+    gray = preprocessor is not None
+    pix = page.get_pixmap(dpi=dpi or choose_dpi(page), clip=clip,
+                          colorspace=fitz.csGRAY if gray else fitz.csRGB)
+    return Image.frombytes("L" if gray else "RGB", [pix.width, pix.height], pix.samples)
+
+
+def _ocr_page(filepath, page_no, page_timeout=0, preprocessor=None, dpi=None, config="", structured=True):
+    """Worker: extract (or OCR) a single PDF page. Runs in a child process.
+
+    Returns (page_no, text, timings) with seconds per stage: "open",
+    "extract" (text layer), "render", "preprocess", "tesseract".
+
+    structured=True rebuilds table rows from the text layer's word
+    coordinates (cells tab-separated) and OCRs only the image regions
+    that have no text layer; scanned pages are OCR'd whole. With
+    structured=False the flat text layer is used, or full-page OCR
+    when there is none.
+    """
+    timings = {}
+    t = time.perf_counter()
+    doc = fitz.open(filepath)
+    try:
+        page = doc[page_no]
+        t = _lap(timings, "open", t)
+        if structured:
+            words = page.get_text("words")
+            parts = [rows_to_text(page_rows(words))] if words else []
+            regions = image_regions(page, words) if words else [None]  # None = whole page
+            t = _lap(timings, "extract", t)
+            for clip in regions:
+                img = _render(page, preprocessor, dpi, clip)
+                _lap(timings, "render", t)
+                parts.append(_ocr_image(img, preprocessor, config, page_timeout, structured=True, timings=timings))
+                t = time.perf_counter()
+            text = "".join(parts)
+        else:
+            # Direct text extract
+            extracted = page.get_text()
+            t = _lap(timings, "extract", t)
+            if extracted.strip():
+                text = extracted + "\n"
+            else:
+                # Fallback: OCR using image
+                img = _render(page, preprocessor, dpi)
+                _lap(timings, "render", t)
+                text = _ocr_image(img, preprocessor, config, page_timeout, timings=timings)
+    finally:
+        doc.close()
+    return page_no, text, timings
+
 
 class OCRTool:
+    def __init__(self, workers=None, page_timeout=60, parallel_min_pages=4,
+                 preprocessor=None, dpi=None, tesseract_config=TESSERACT_CONFIG,
+                 structured=True):
+        # workers=None -> one per CPU core; workers=1 -> always serial
+        self.workers = workers or os.cpu_count() or 1
+        self.page_timeout = page_timeout
+        self.parallel_min_pages = parallel_min_pages
+        # preprocessor=None -> default ImagePreprocessor; False -> raw image to Tesseract
+        if preprocessor is None:
+            preprocessor = ImagePreprocessor()
+        self.preprocessor = preprocessor or None
+        self.dpi = dpi                      # None -> adaptive per page (see choose_dpi)
+        self.tesseract_config = tesseract_config
+        self.structured = structured        # table rows from word coordinates (see _ocr_page)
+
+    def settings(self):
+        """Everything that changes the OCR output (used in cache keys)."""
+        return {
+            "page_timeout": self.page_timeout,
+            "preprocess": self.preprocessor.settings() if self.preprocessor else None,
+            "dpi": self.dpi,
+            "tesseract_config": self.tesseract_config,
+            "structured": self.structured,
+        }
+
+    def _page_args(self):
+        return self.page_timeout, self.preprocessor, self.dpi, self.tesseract_config, self.structured
+
     def run(self, filepath):
         """Unified OCR method that works for both PDF & Images."""
-        text = ""
+        return self.run_timed(filepath)[0]
 
+    def run_timed(self, filepath):
+        """(text, [timings per page]) -- see iter_results()."""
+        pages = []
+        try:
+            for text, timings in self.iter_results(filepath):
+                pages.append((text, timings))
+        except Exception as e:
+            kind = "PDF" if filepath.lower().endswith(".pdf") else "Image"
+            return f"{kind} Error: {str(e)}", [t for _, t in pages]
+        return "".join(text for text, _ in pages), [t for _, t in pages]
+
+    def iter_pages(self, filepath):
+        """Yield document text one page at a time, in page order.
+
+        Lets callers start parsing before OCR of the whole file is done
+        and avoids holding more than one page of text at once.
+        """
+        for text, _ in self.iter_results(filepath):
+            yield text
+
+    def iter_results(self, filepath):
+        """Like iter_pages() but yields (text, timings) per page.
+
+        timings are seconds per stage (see _ocr_page); a page that hit
+        the timeout comes back as "" with a "timeout" entry. Returned
+        with each page rather than kept on the tool, since the module
+        singleton is shared by concurrent jobs.
+        """
         # If PDF
         if filepath.lower().endswith(".pdf"):
-            try:
-                doc = fitz.open(filepath)
-                for page in doc:
-                    # Direct text extract
-                    extracted = page.get_text()
-                    if extracted.strip():
-                        text += extracted + "\n"
-                    else:
-                        # Fallback: OCR using image
-                        pix = page.get_pixmap()
-                        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                        text += pytesseract.image_to_string(img)
-                return text
-            except Exception as e:
-                return f"PDF Error: {str(e)}"
+            with fitz.open(filepath) as doc:
+                page_count = doc.page_count
+            if self.workers > 1 and page_count >= self.parallel_min_pages:
+                pages = self._iter_parallel(filepath, page_count)
+            else:
+                pages = self._iter_serial(filepath, page_count)
+            for page_no, text, timings in pages:
+                self._record_page(page_no, timings)
+                yield text, timings
+            return
 
         # If Image
+        timings = {}
+        t = time.perf_counter()
+        img = Image.open(filepath)
+        if self.dpi is None:
+            img = scale_to_dpi(img)
+        _lap(timings, "open", t)
         try:
-            img = Image.open(filepath)
-            return pytesseract.image_to_string(img)
-        except Exception as e:
-            return f"Image Error: {str(e)}"
+            text = _ocr_image(img, self.preprocessor, self.tesseract_config, self.page_timeout,
+                              structured=self.structured, timings=timings)
+        except PageTimeout:
+            text, timings = self._timed_out()
+        self._record_page(0, timings)
+        yield text, timings
+
+    def _record_page(self, page_no, timings):
+        """Page breakdown into the current trace + per-stage histograms."""
+        secs = sum(timings.values())
+        span = tracer.record("ocr.page", secs, page=page_no,
+                             **{k: round(v, 4) for k, v in timings.items()})
+        for stage, v in timings.items():
+            tracer.observe("healthbuddy_ocr_stage_seconds", v, stage=stage)
+        tracer.count("healthbuddy_ocr_pages_total", mode="tesseract" if "tesseract" in timings else "text")
+        return span
+
+    def _timed_out(self):
+        return "", {"timeout": float(self.page_timeout or 0)}
+
+    def _iter_serial(self, filepath, page_count):
+        for i in range(page_count):
+            try:
+                _, text, timings = _ocr_page(filepath, i, *self._page_args())
+            except PageTimeout:  # flagged, so the caller can tell the page is missing
+                text, timings = self._timed_out()
+            yield i, text, timings
+
+    def _iter_parallel(self, filepath, page_count):
+        """Rasterize + OCR pages across a process pool, yielded in page order."""
+        workers = min(self.workers, page_count)
+        pool = ProcessPoolExecutor(max_workers=workers)
+        futures = {}
+        try:
+            for i in range(page_count):
+                futures[i] = pool.submit(_ocr_page, filepath, i, *self._page_args())
+            deadline = self._deadline(page_count, workers)
+            i, rebuilt = 0, False
+            while i < page_count:
+                try:
+                    # tesseract enforces page_timeout itself; the deadline is a
+                    # backstop for pages stuck in rasterization, shared by the
+                    # whole document rather than restarted for every page
+                    _, text, timings = futures[i].result(timeout=self._remaining(deadline))
+                except PageTimeout:
+                    text, timings = self._timed_out()
+                except FutureTimeout:
+                    # a worker is hung: kill the pool and redo the pages that
+                    # had not finished on a fresh one
+                    text, timings = self._timed_out()
+                    pending = [j for j in range(i + 1, page_count) if not futures[j].done()]
+                    pool, deadline = self._respawn(pool, futures, filepath, pending, workers)
+                except BrokenProcessPool:
+                    # a worker died (crash, OOM kill) and took the pool down:
+                    # rebuild it once for the pages that were lost, then give up
+                    if rebuilt:
+                        raise
+                    rebuilt = True
+                    lost = [j for j in range(i, page_count)
+                            if not futures[j].done() or isinstance(futures[j].exception(), BrokenProcessPool)]
+                    pool, deadline = self._respawn(pool, futures, filepath, lost, workers)
+                    continue
+                yield i, text, timings
+                i += 1
+        finally:
+            # consumer may stop early: drop pages that haven't started
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _respawn(self, pool, futures, filepath, pages, workers):
+        """Kill `pool` and resubmit `pages` to a fresh one -> (pool, deadline)."""
+        _terminate(pool)
+        pool = ProcessPoolExecutor(max_workers=workers)
+        for j in pages:
+            futures[j] = pool.submit(_ocr_page, filepath, j, *self._page_args())
+        return pool, self._deadline(len(pages), workers)
+
+    def _deadline(self, pages, workers):
+        if not self.page_timeout or not pages:
+            return None
+        # each worker gets through ceil(pages / workers) pages, 2x timeout apiece
+        return time.monotonic() + math.ceil(pages / workers) * self.page_timeout * 2
+
+    @staticmethod
+    def _remaining(deadline):
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
 
+def _terminate(pool):
+    """Kill the worker processes; shutdown() alone leaves a hung one running."""
+    for proc in list((pool._processes or {}).values()):
+        proc.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
 
 ocr_tool = OCRTool()
@@ -1,9 +1,17 @@
 import re
 
+from tools.pdf_layout import CELL_SEP  # table rows rebuilt by OCRTool (structured mode)
+from tools.tracing import tracer
+
+NUMBER_RE = re.compile(r"[0-9]+\.?[0-9]*")
+UNIT_RE = re.compile(r"(g/dl|mg/dl|ng/ml|iu/l|mlu/ml|%|/ul)")
+FLAGS = {"h": "High", "high": "High", "l": "Low", "low": "Low"}
+
+
 class ParserTool:
     def __init__(self):
         self.tests = {
-            "hemoglobin": ["hemoglobin", "hb"],
+            "hemoglobin": ["hemoglobin", "haemoglobin", "hb"],
             "wbc": ["wbc", "white blood cell", "total leukocyte"],
             "platelets": ["platelet", "plt"],
             "bilirubin_total": ["bilirubin"],
@@ -12,8 +20,8 @@ class ParserTool:
             "creatinine": ["creatinine"],
             "urea": ["urea"],
             "tsh": ["tsh"],
-            "t3": ["t3"],
-            "t4": ["t4"],
+            "t3": ["t3", "ft3", "free t3"],
+            "t4": ["t4", "ft4", "free t4"],
             "vitamin_d": ["vit d", "vitamin d", "25-oh"],
             "vitamin_b12": ["b12", "vitamin b12"],
             "fbs": ["fasting", "fbs"],
@@ -24,27 +32,76 @@ class ParserTool:
             "prolactin": ["prolactin"],
             "amh": ["amh", "anti mullerian"],
         }
+        self._compile()
 
-    def detect_test(self, line_lower):
+    def _compile(self):
+        """Build one alternation regex over every alias in the catalog.
+
+        Aliases only match on word boundaries (so "hb" no longer fires
+        inside "hba1c", nor "alt" inside "salt"), and longer aliases are
+        tried first so "vitamin b12" wins over "b12".
+        """
+        self._alias_to_test = {}
         for test, keys in self.tests.items():
-            if any(k in line_lower for k in keys):
-                return test
-        return None
+            for k in keys:
+                self._alias_to_test.setdefault(self._normalize(k), test)
+
+        aliases = sorted(self._alias_to_test, key=len, reverse=True)
+        pattern = "|".join(re.escape(a).replace(r"\ ", r"\s+") for a in aliases)
+        self._alias_re = re.compile(rf"(?<![a-z0-9])(?:{pattern})(?![a-z0-9])")
+
+    def add_test(self, test, aliases):
+        self.tests.setdefault(test, []).extend(aliases)
+        self._compile()
+
+    @staticmethod
+    def _normalize(s):
+        return " ".join(s.split())
+
+    def match_test(self, line_lower):
+        """Leftmost alias match in the line -> (test, end offset) or (None, 0).
+
+        Aliases of the same test that follow immediately (e.g.
+        "Vitamin D (25-OH)") are folded into the match.
+        """
+        test, end = None, 0
+        for m in self._alias_re.finditer(line_lower):
+            found = self._alias_to_test[self._normalize(m.group(0))]
+            if test is None:
+                test, end = found, m.end()
+            elif found == test and not NUMBER_RE.search(line_lower, end, m.start()):
+                end = m.end()
+            else:
+                break
+        return test, end
+
+    def detect_test(self, line_lower):
+        return self.match_test(line_lower)[0]
+
+    def find_tests(self, text):
+        """Canonical names of every test mentioned anywhere in free text."""
+        return {self._alias_to_test[self._normalize(m.group(0))]
+                for m in self._alias_re.finditer(text.lower())}
 
     def extract_numbers(self, line):
-        return re.findall(r"[0-9]+\.?[0-9]*", line)
+        return NUMBER_RE.findall(line)
 
     def detect_unit(self, line_lower):
-        m = re.search(r"(g/dl|mg/dl|ng/ml|iu/l|mlu/ml|%|/ul)", line_lower)
+        m = UNIT_RE.search(line_lower)
         return m.group(1) if m else ""
 
     def parse_line(self, line):
+        if CELL_SEP in line:
+            return next(self.parse_row(line.split(CELL_SEP)), (None, None))
         line_lower = line.lower()
-        test = self.detect_test(line_lower)
+        test, end = self.match_test(line_lower)
         if not test:
             return None, None
 
-        nums = self.extract_numbers(line)
+        # Only look right of the test name, so digits inside aliases
+        # ("b12", "t3", "25-oh") are not mistaken for the result.
+        rest = line_lower[end:]
+        nums = self.extract_numbers(rest)
         if len(nums) == 0:
             return None, None
 
@@ -55,17 +112,81 @@ class ParserTool:
 
         return test, {
             "value": value,
-            "unit": self.detect_unit(line_lower),
+            "unit": self.detect_unit(rest),
             "flag": "Low" if "low" in line_lower else ("High" if "high" in line_lower else ""),
             "reference_range": ref_range
         }
 
-    def parse(self, text):
-        structured = {}
-        for line in text.split("\n"):
+    def parse_row(self, cells):
+        """Yield (test, info) from one table row given as cells.
+
+        Each cell that names a test starts a record (so side-by-side
+        tables on one row both parse); the cells after it are read by
+        column: the first single number is the value, a two-number (or
+        "< x") cell the reference range, plus the unit and an H/L flag column.
+        A cell holding value and range together ("13.2 g/dL 12.0-16.0") is
+        read like a text line; a row that yields nothing this way is parsed
+        as one line after all (parse_line on the joined cells).
+        """
+        found = False
+        record = None
+        for cell in cells:
+            cell = cell.strip().lower()
+            test, end = self.match_test(cell)
+            if test:
+                if record and record[1]["value"] is not None:
+                    found = True
+                    yield record
+                record = (test, {"value": None, "unit": "", "flag": "", "reference_range": None})
+                cell = cell[end:]  # "Hemoglobin (Hb) 13.2" -> read the rest as a cell too
+            if record is None or not cell:
+                continue
+            info = record[1]
+            nums = NUMBER_RE.findall(cell)
+            if len(nums) >= 3 and info["value"] is None:
+                info["value"] = float(nums[0])
+                if info["reference_range"] is None:
+                    info["reference_range"] = f"{nums[1]} - {nums[2]}"
+            elif len(nums) >= 2 and info["reference_range"] is None:
+                info["reference_range"] = f"{nums[0]} - {nums[1]}"
+            elif cell[0] in "<>≤≥" and nums and info["reference_range"] is None:
+                info["reference_range"] = f"{cell[0]} {nums[0]}"
+            elif len(nums) == 1 and info["value"] is None:
+                info["value"] = float(nums[0])
+            info["unit"] = info["unit"] or self.detect_unit(cell)
+            for word in cell.split():
+                info["flag"] = info["flag"] or FLAGS.get(word, "")
+        if record and record[1]["value"] is not None:
+            yield record
+        elif not found:
+            test, info = self.parse_line(" ".join(cells))
+            if test:
+                yield test, info
+
+    def iter_lines(self, chunks):
+        """Re-split a stream of text chunks (e.g. OCR pages) into lines."""
+        carry = ""
+        for chunk in chunks:
+            lines = (carry + chunk).split("\n")
+            carry = lines.pop()
+            yield from lines
+        if carry:
+            yield carry
+
+    def parse_iter(self, lines):
+        """Yield (test, info) for every recognised line as it is consumed."""
+        for line in lines:
+            if CELL_SEP in line:
+                yield from self.parse_row(line.split(CELL_SEP))
+                continue
             test, info = self.parse_line(line)
             if test and info:
-                structured[test] = info
-        return structured
+                yield test, info
+
+    def parse(self, text):
+        with tracer.span("parse") as span:
+            data = dict(self.parse_iter(text.split("\n")))
+            span.set(tests=len(data))
+        return data
 
 parser_tool = ParserTool()
@@ -0,0 +1,619 @@
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from tools.lab_model import LabPanel, encode_results, decode_results
+from tools.trends import update_trend, trend_record
+from tools import retrieval
+from tools.tracing import tracer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_id  TEXT NOT NULL,
+    timestamp   TEXT NOT NULL,
+    data        TEXT NOT NULL,
+    source      TEXT NOT NULL DEFAULT 'upload'
+);
+CREATE INDEX IF NOT EXISTS idx_reports_patient_ts ON reports (patient_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS analyte_values (
+    report_id       INTEGER NOT NULL REFERENCES reports (id),
+    patient_id      TEXT NOT NULL,
+    analyte         TEXT NOT NULL,
+    value           REAL,
+    unit            TEXT,
+    flag            TEXT,
+    reference_range TEXT,
+    timestamp       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analyte_patient_name_ts
+    ON analyte_values (patient_id, analyte, timestamp);
+
+CREATE TABLE IF NOT EXISTS analyte_trends (
+    patient_id  TEXT NOT NULL,
+    analyte     TEXT NOT NULL,
+    count       INTEGER NOT NULL,
+    last_value  REAL,
+    last_ts     TEXT,
+    prev_value  REAL,
+    prev_ts     TEXT,
+    mean        REAL,
+    min_value   REAL,
+    max_value   REAL,
+    t0          REAL NOT NULL,
+    sum_t       REAL NOT NULL,
+    sum_v       REAL NOT NULL,
+    sum_tt      REAL NOT NULL,
+    sum_tv      REAL NOT NULL,
+    PRIMARY KEY (patient_id, analyte)
+);
+
+CREATE TABLE IF NOT EXISTS retrieval_docs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_id  TEXT NOT NULL,
+    source      TEXT NOT NULL,
+    timestamp   TEXT NOT NULL,
+    text        TEXT NOT NULL,
+    length      INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_retrieval_docs_patient ON retrieval_docs (patient_id);
+
+CREATE TABLE IF NOT EXISTS retrieval_postings (
+    patient_id  TEXT NOT NULL,
+    term        TEXT NOT NULL,
+    doc_id      INTEGER NOT NULL REFERENCES retrieval_docs (id),
+    tf          INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_retrieval_postings_term ON retrieval_postings (patient_id, term);
+
+CREATE TABLE IF NOT EXISTS summaries (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_id  TEXT NOT NULL,
+    timestamp   TEXT NOT NULL,
+    extracted   TEXT NOT NULL,
+    summary     TEXT NOT NULL,
+    tips        TEXT NOT NULL,
+    preview     TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_summaries_patient_ts ON summaries (patient_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS chats (
+    id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    user     TEXT NOT NULL,
+    role     TEXT NOT NULL,
+    message  TEXT NOT NULL,
+    time     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chats_user ON chats (user, id);
+
+CREATE TABLE IF NOT EXISTS chat_state (
+    user             TEXT PRIMARY KEY,
+    context          TEXT NOT NULL DEFAULT '',
+    summary          TEXT NOT NULL DEFAULT '',
+    summarized_upto  INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    patient_id  TEXT NOT NULL,
+    file_path   TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    stage       TEXT NOT NULL DEFAULT '',
+    progress    REAL NOT NULL DEFAULT 0,
+    result      TEXT,
+    error       TEXT,
+    created     TEXT NOT NULL,
+    updated     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created);
+"""
+
+# batch_ingest.py bookkeeping: one row per (patient, file content); error is
+# set while the file keeps failing and cleared once its report is written
+INGESTED_FILES = """
+CREATE TABLE IF NOT EXISTS ingested_files (
+    patient_id    TEXT NOT NULL,
+    content_hash  TEXT NOT NULL,
+    path          TEXT NOT NULL,
+    report_id     INTEGER,
+    timestamp     TEXT NOT NULL,
+    error         TEXT,
+    PRIMARY KEY (patient_id, content_hash)
+);
+"""
+
+
+def now_iso():
+    return datetime.utcnow().isoformat()
+
+
+def summary_preview(summary, length=150):
+    return summary.get("english_summary", "No summary available")[:length] + "..."
+
+
+class PatientStore:
+    """Single embedded SQLite database for everything we keep per patient.
+
+    Tables: reports (one parsed snapshot per upload), analyte_values (one
+    row per test per report, indexed by patient/analyte/time), summaries
+    (summary + tips shown in the dashboard history) and chats. Parsed
+    results (reports.data, summaries.extracted) are LabPanel bytes (see
+    tools/lab_model.py); rows written as JSON before that still load.
+
+    Runs in WAL mode so readers never block the writer, and every write
+    is a single transaction: appending a report costs the same no matter
+    how long the history is, and concurrent Streamlit sessions serialise
+    on SQLite's own file lock instead of clobbering shared JSON files.
+    """
+
+    def __init__(self, db_path="memory/healthbuddy.db"):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._local = threading.local()
+        with self.connect() as conn:
+            tables = {r["name"] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            conn.executescript(SCHEMA + INGESTED_FILES)
+            self._upgrade(conn)
+            if "analyte_trends" not in tables:
+                self._rebuild_trends(conn)
+            if "retrieval_docs" not in tables:
+                self._rebuild_index(conn)
+
+    def _rebuild_trends(self, conn):
+        # one-off catch-up for values stored before trends were tracked
+        rows = conn.execute(
+            "SELECT patient_id, analyte, value, timestamp FROM analyte_values ORDER BY timestamp"
+        ).fetchall()
+        for r in rows:
+            update_trend(conn, r["patient_id"], r["analyte"], r["value"], r["timestamp"])
+
+    def _rebuild_index(self, conn):
+        # one-off catch-up for reports/summaries stored before retrieval indexing
+        for r in conn.execute("SELECT patient_id, timestamp, data FROM reports ORDER BY timestamp").fetchall():
+            self._index_report(conn, r["patient_id"], r["timestamp"], decode_results(r["data"]))
+        for r in conn.execute("SELECT patient_id, timestamp, summary, tips FROM summaries").fetchall():
+            self._index_summary(conn, r["patient_id"], r["timestamp"], json.loads(r["summary"]),
+                                json.loads(r["tips"]))
+
+    def _upgrade(self, conn):
+        # databases created before summaries had a precomputed preview
+        cols = {r["name"] for r in conn.execute("PRAGMA table_info(summaries)")}
+        if "preview" not in cols:
+            conn.execute("ALTER TABLE summaries ADD COLUMN preview TEXT NOT NULL DEFAULT ''")
+            rows = conn.execute("SELECT id, summary FROM summaries").fetchall()
+            conn.executemany(
+                "UPDATE summaries SET preview = ? WHERE id = ?",
+                [(summary_preview(json.loads(r["summary"])), r["id"]) for r in rows],
+            )
+        # reports didn't tell uploads from batch_ingest.py backfills
+        cols = {r["name"] for r in conn.execute("PRAGMA table_info(reports)")}
+        if "source" not in cols:
+            conn.execute("ALTER TABLE reports ADD COLUMN source TEXT NOT NULL DEFAULT 'upload'")
+        # ingested_files used to be keyed on the content hash alone, without errors
+        cols = {r["name"] for r in conn.execute("PRAGMA table_info(ingested_files)")}
+        if "error" not in cols:
+            conn.execute("ALTER TABLE ingested_files RENAME TO ingested_files_old")
+            conn.execute(INGESTED_FILES)
+            conn.execute(
+                "INSERT INTO ingested_files (patient_id, content_hash, path, report_id, timestamp) "
+                "SELECT patient_id, content_hash, path, report_id, timestamp FROM ingested_files_old"
+            )
+            conn.execute("DROP TABLE ingested_files_old")
+
+    def connect(self):
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    ###########################
+    # Reports / analytes
+    ###########################
+    def _insert_report(self, conn, patient_id, timestamp, data, source="upload"):
+        # data: LabPanel or {test: info}; stored as panel bytes when it is one,
+        # and analyte rows/snippets then use the same canonical units and ranges
+        raw = encode_results(data)
+        if isinstance(raw, bytes):
+            data = decode_results(raw)
+        cur = conn.execute(
+            "INSERT INTO reports (patient_id, timestamp, data, source) VALUES (?, ?, ?, ?)",
+            (patient_id, timestamp, raw, source),
+        )
+        report_id = cur.lastrowid
+        conn.executemany(
+            "INSERT INTO analyte_values (report_id, patient_id, analyte, value, unit, flag, "
+            "reference_range, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (report_id, patient_id, test, info.get("value"), info.get("unit", ""),
+                 info.get("flag", ""), info.get("reference_range"), timestamp)
+                for test, info in data.items()
+            ],
+        )
+        for test, info in data.items():
+            update_trend(conn, patient_id, test, info.get("value"), timestamp)
+        self._index_report(conn, patient_id, timestamp, data)
+        return report_id
+
+    @staticmethod
+    def _index_report(conn, patient_id, timestamp, data):
+        for test, info in data.items():
+            retrieval.index_document(conn, patient_id, "report", timestamp,
+                                     retrieval.analyte_snippet(timestamp, test, info))
+
+    @staticmethod
+    def _index_summary(conn, patient_id, timestamp, summary, tips):
+        if summary.get("doctor_note"):
+            retrieval.index_document(conn, patient_id, "doctor_note", timestamp,
+                                     f"{timestamp[:10]} doctor note: {summary['doctor_note']}")
+        if tips:
+            retrieval.index_document(conn, patient_id, "tips", timestamp,
+                                     f"{timestamp[:10]} health tips: " + "; ".join(map(str, tips)))
+
+    @tracer.traced("store.append_history")
+    def append_history(self, patient_id, data, timestamp=None):
+        with self.connect() as conn:
+            return self._insert_report(conn, patient_id, timestamp or now_iso(), data)
+
+    @tracer.traced("store.load_history")
+    def load_history(self, patient_id, since=None, until=None, limit=None):
+        """Snapshots for a patient, oldest first: [{"timestamp", "data"}]."""
+        sql = "SELECT timestamp, data FROM reports WHERE patient_id = ?"
+        args = [patient_id]
+        if since:
+            sql += " AND timestamp >= ?"
+            args.append(since)
+        if until:
+            sql += " AND timestamp < ?"
+            args.append(until)
+        sql += " ORDER BY timestamp"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(limit)
+        rows = self.connect().execute(sql, args).fetchall()
+        return [{"timestamp": r["timestamp"], "data": decode_results(r["data"])} for r in rows]
+
+    def latest_report(self, patient_id):
+        """Newest report of a patient as a LabPanel (empty if none).
+
+        Backfilled archive reports only count when the patient has no
+        uploads: their file-mtime timestamp says little about recency.
+        """
+        row = self.connect().execute(
+            "SELECT data FROM reports WHERE patient_id = ? "
+            "ORDER BY source = 'backfill', timestamp DESC, id DESC LIMIT 1",
+            (patient_id,),
+        ).fetchone()
+        if row is None:
+            return LabPanel()
+        try:
+            return LabPanel.load(row["data"])
+        except ValueError:  # legacy free-form record, not a lab panel
+            return LabPanel()
+
+    def analyte_series(self, patient_id, analyte):
+        """All values of one analyte for a patient, oldest first (index lookup)."""
+        rows = self.connect().execute(
+            "SELECT timestamp, value, unit, flag, reference_range FROM analyte_values "
+            "WHERE patient_id = ? AND analyte = ? ORDER BY timestamp",
+            (patient_id, analyte),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    @tracer.traced("store.bulk_add_reports")
+    def bulk_add_reports(self, items):
+        """Insert many parsed reports in one transaction.
+
+        items: [(patient_id, content_hash, path, data, timestamp)]. Files
+        already ingested for that patient are skipped, so re-running a batch
+        is safe. Rows are marked as backfill, so they stay in the history
+        without replacing the latest upload. Returns the number inserted.
+        """
+        added = 0
+        with self.connect() as conn:
+            for patient_id, content_hash, path, data, ts in items:
+                if conn.execute("SELECT 1 FROM ingested_files WHERE patient_id = ? AND content_hash = ? "
+                                "AND error IS NULL", (patient_id, content_hash)).fetchone():
+                    continue
+                report_id = self._insert_report(conn, patient_id, ts, data, source="backfill")
+                conn.execute(
+                    "INSERT OR REPLACE INTO ingested_files (patient_id, content_hash, path, report_id, timestamp) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (patient_id, content_hash, path, report_id, ts),
+                )
+                added += 1
+        return added
+
+    def record_ingest_failures(self, items):
+        """Remember files that failed: [(patient_id, content_hash, path, error)].
+
+        They stay out of ingested_hashes(), so the next run retries them;
+        a file that was ingested meanwhile keeps its report.
+        """
+        ts = now_iso()
+        with self.connect() as conn:
+            conn.executemany(
+                "INSERT INTO ingested_files (patient_id, content_hash, path, timestamp, error) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (patient_id, content_hash) DO UPDATE SET "
+                "path = excluded.path, timestamp = excluded.timestamp, error = excluded.error "
+                "WHERE ingested_files.error IS NOT NULL",
+                [(pid, h, path, ts, error) for pid, h, path, error in items],
+            )
+
+    def ingested_hashes(self):
+        """{(patient_id, content_hash)} of files whose report is stored."""
+        rows = self.connect().execute("SELECT patient_id, content_hash FROM ingested_files WHERE error IS NULL")
+        return {(r[0], r[1]) for r in rows}
+
+    def failed_ingests(self):
+        """{(patient_id, content_hash): error} of files that failed last time."""
+        rows = self.connect().execute(
+            "SELECT patient_id, content_hash, error FROM ingested_files WHERE error IS NOT NULL")
+        return {(r[0], r[1]): r[2] for r in rows}
+
+    def analyte_rows(self, patient_id=None):
+        """Every stored value (one patient, or all patients), oldest first."""
+        sql = "SELECT patient_id, analyte, timestamp, value FROM analyte_values"
+        args = ()
+        if patient_id is not None:
+            sql += " WHERE patient_id = ?"
+            args = (patient_id,)
+        rows = self.connect().execute(sql + " ORDER BY timestamp", args).fetchall()
+        return [dict(r) for r in rows]
+
+    def trends(self, patient_id):
+        """Per-analyte trend aggregates (see tools/trends.py), one row per analyte."""
+        rows = self.connect().execute(
+            "SELECT * FROM analyte_trends WHERE patient_id = ? ORDER BY analyte", (patient_id,)
+        ).fetchall()
+        return [trend_record(r) for r in rows]
+
+    @tracer.traced("store.search")
+    def search(self, patient_id, query, k=8, extra_terms=()):
+        """Top-k BM25 snippets from the patient's reports, doctor notes and tips."""
+        return retrieval.search(self.connect(), patient_id, query, k, extra_terms)
+
+    ###########################
+    # Summaries (dashboard history)
+    ###########################
+    @tracer.traced("store.save_summary")
+    def save_summary(self, patient_id, extracted, summary, tips, timestamp=None):
+        with self.connect() as conn:
+            return self._insert_summary(conn, patient_id, extracted, summary, tips, timestamp or now_iso())
+
+    def _insert_summary(self, conn, patient_id, extracted, summary, tips, timestamp):
+        cur = conn.execute(
+            "INSERT INTO summaries (patient_id, timestamp, extracted, summary, tips, preview) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (patient_id, timestamp,
+             encode_results(extracted),
+             json.dumps(summary, ensure_ascii=False),
+             json.dumps(tips, ensure_ascii=False),
+             summary_preview(summary)),
+        )
+        self._index_summary(conn, patient_id, timestamp, summary, tips)
+        return cur.lastrowid
+
+    def list_summaries(self, patient_id):
+        """Full dashboard records for a patient, newest first."""
+        rows = self.connect().execute(
+            "SELECT * FROM summaries WHERE patient_id = ? ORDER BY timestamp DESC",
+            (patient_id,),
+        ).fetchall()
+        return [self._summary_record(r) for r in rows]
+
+    def count_summaries(self, patient_id):
+        return self.connect().execute(
+            "SELECT COUNT(*) FROM summaries WHERE patient_id = ?", (patient_id,)
+        ).fetchone()[0]
+
+    def list_summary_page(self, patient_id, page=0, page_size=10):
+        """One page of the history index (id, timestamp, preview), newest first.
+
+        Only the small index columns are read; use load_summary() for the
+        full record.
+        """
+        rows = self.connect().execute(
+            "SELECT id, timestamp, preview FROM summaries WHERE patient_id = ? "
+            "ORDER BY timestamp DESC LIMIT ? OFFSET ?",
+            (patient_id, page_size, page * page_size),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def load_summary(self, summary_id):
+        row = self.connect().execute(
+            "SELECT * FROM summaries WHERE id = ?", (summary_id,)
+        ).fetchone()
+        return self._summary_record(row) if row else None
+
+    @staticmethod
+    def _summary_record(row):
+        return {
+            "id": row["id"],
+            "timestamp": row["timestamp"],
+            "extracted_data": decode_results(row["extracted"]),
+            "summary": json.loads(row["summary"]),
+            "health_tips": json.loads(row["tips"]),
+        }
+
+    ###########################
+    # Chats
+    ###########################
+    def append_chat(self, user, role, message, time=None):
+        with self.connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO chats (user, role, message, time) VALUES (?, ?, ?, ?)",
+                (user, role, message, time or now_iso()),
+            )
+        return cur.lastrowid
+
+    def load_chat(self, user, limit=None):
+        """Chat turns oldest first; with limit, only the last `limit` turns."""
+        if limit:
+            rows = self.connect().execute(
+                "SELECT role, message, time FROM "
+                "(SELECT * FROM chats WHERE user = ? ORDER BY id DESC LIMIT ?) ORDER BY id",
+                (user, limit),
+            ).fetchall()
+        else:
+            rows = self.connect().execute(
+                "SELECT role, message, time FROM chats WHERE user = ? ORDER BY id", (user,)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def load_chat_after(self, user, after_id, limit=None):
+        """Turns with id > after_id (oldest first), including their ids."""
+        sql = "SELECT id, role, message, time FROM chats WHERE user = ? AND id > ? ORDER BY id"
+        args = [user, after_id]
+        if limit:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return [dict(r) for r in self.connect().execute(sql, args).fetchall()]
+
+    def get_chat_state(self, user):
+        row = self.connect().execute("SELECT * FROM chat_state WHERE user = ?", (user,)).fetchone()
+        if row:
+            return dict(row)
+        return {"user": user, "context": "", "summary": "", "summarized_upto": 0}
+
+    def set_chat_state(self, user, **fields):
+        state = {**self.get_chat_state(user), **fields}
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO chat_state (user, context, summary, summarized_upto) "
+                "VALUES (?, ?, ?, ?)",
+                (user, state["context"], state["summary"], state["summarized_upto"]),
+            )
+
+    ###########################
+    # Ingest jobs
+    ###########################
+    def create_job(self, job_id, patient_id, file_path):
+        ts = now_iso()
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, patient_id, file_path, status, created, updated) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, patient_id, file_path, ts, ts),
+            )
+
+    def update_job(self, job_id, **fields):
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], ensure_ascii=False)
+        fields["updated"] = now_iso()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self.connect() as conn:
+            conn.execute(f"UPDATE jobs SET {cols} WHERE id = ?", [*fields.values(), job_id])
+
+    def get_job(self, job_id):
+        row = self.connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def finish_job(self, job_id, patient_id, report, result):
+        """Store a processed upload and mark its job done in one transaction.
+
+        report: {"extracted", "summary", "tips"}. A job interrupted before
+        this (restart, cancel) has stored nothing, so running it again from
+        the start cannot duplicate the report.
+        """
+        ts = now_iso()
+        with self.connect() as conn:
+            if report["extracted"]:
+                self._insert_report(conn, patient_id, ts, report["extracted"])
+            self._insert_summary(conn, patient_id, report["extracted"], report["summary"], report["tips"], ts)
+            conn.execute(
+                "UPDATE jobs SET status = 'done', stage = 'saved', progress = 1.0, result = ?, updated = ? "
+                "WHERE id = ?",
+                (json.dumps(result, ensure_ascii=False), ts, job_id),
+            )
+
+    def unfinished_jobs(self):
+        rows = self.connect().execute(
+            "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created"
+        ).fetchall()
+        return [r["id"] for r in rows]
+
+    ###########################
+    # Legacy JSON import
+    ###########################
+    @contextlib.contextmanager
+    def _claim(self, path):
+        """Rename a legacy file to *.importing so only one caller imports it.
+
+        Yields the claimed path, or None when the file is gone (already
+        imported, or another process claimed it first). Renamed to
+        *.imported once the block succeeds, and back if it fails so the
+        import can be retried.
+        """
+        claimed = path + ".importing"
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            yield None
+            return
+        try:
+            yield claimed
+        except BaseException:
+            os.replace(claimed, path)
+            raise
+        os.replace(claimed, path + ".imported")
+
+    def import_legacy_history(self, patient_id, history_path):
+        """One-off import of an old {patient_id}_history.json list, then rename it."""
+        with self._claim(history_path) as path:
+            if path is None:
+                return 0
+            with open(path) as f:
+                hist = json.load(f)
+            with self.connect() as conn:
+                for h in hist:
+                    self._insert_report(conn, patient_id, h["timestamp"], h["data"])
+        return len(hist)
+
+    def import_legacy_record(self, patient_id, record_path):
+        """Import one memory/{patient_id}/{epoch}.json dashboard record, then rename it."""
+        with self._claim(record_path) as path:
+            if path is None:
+                return 0
+            with open(path) as f:
+                rec = json.load(f)
+            epoch = os.path.splitext(os.path.basename(record_path))[0]
+            try:
+                timestamp = datetime.utcfromtimestamp(int(epoch)).isoformat()
+            except ValueError:
+                if rec.get("timestamp"):
+                    timestamp = datetime.strptime(rec["timestamp"], "%d-%m-%Y %H:%M:%S").isoformat()
+                else:
+                    timestamp = datetime.utcfromtimestamp(os.path.getmtime(path)).isoformat()
+            self.save_summary(patient_id, rec.get("extracted_data", {}), rec.get("summary", {}),
+                              rec.get("health_tips", []), timestamp)
+        return 1
+
+    def import_legacy_chat(self, user, chat_path):
+        """Import one memory/chat/{user}.json transcript, then rename it."""
+        with self._claim(chat_path) as path:
+            if path is None:
+                return 0
+            with open(path) as f:
+                hist = json.load(f)
+            with self.connect() as conn:
+                conn.executemany(
+                    "INSERT INTO chats (user, role, message, time) VALUES (?, ?, ?, ?)",
+                    [(user, h["role"], h["message"], h["time"]) for h in hist],
+                )
+        return len(hist)
+
+patient_store = PatientStore()
@@ -0,0 +1,61 @@
+from tools.lazy_import import lazy_import
+
+fitz = lazy_import("fitz")  # PyMuPDF
+
+CELL_SEP = "\t"  # separates table cells within a rebuilt row
+
+
+def page_rows(words, gap_factor=1.0):
+    """Rebuild visual table rows from PyMuPDF words.
+
+    `words` are page.get_text("words") tuples (x0, y0, x1, y1, text, ...).
+    Words whose vertical centre falls inside a row's band join that row;
+    within a row, a horizontal gap wider than gap_factor x the text height
+    starts a new cell. Returns [[cell, ...], ...] top to bottom.
+    """
+    rows = []  # [y0, y1, [words]]
+    for w in sorted(words, key=lambda w: ((w[1] + w[3]) / 2, w[0])):
+        mid = (w[1] + w[3]) / 2
+        if rows and rows[-1][0] <= mid <= rows[-1][1]:
+            row = rows[-1]
+            row[0], row[1] = min(row[0], w[1]), max(row[1], w[3])
+            row[2].append(w)
+        else:
+            rows.append([w[1], w[3], [w]])
+
+    table = []
+    for y0, y1, row_words in rows:
+        row_words.sort(key=lambda w: w[0])
+        max_gap = gap_factor * (y1 - y0)
+        cells, cell, prev_x1 = [], [], None
+        for w in row_words:
+            if prev_x1 is not None and w[0] - prev_x1 > max_gap:
+                cells.append(" ".join(cell))
+                cell = []
+            cell.append(w[4])
+            prev_x1 = w[2]
+        cells.append(" ".join(cell))
+        table.append(cells)
+    return table
+
+
+def rows_to_text(rows):
+    return "".join(CELL_SEP.join(cells) + "\n" for cells in rows)
+
+
+def image_regions(page, words, min_area_ratio=0.05):
+    """Rects of images on the page that carry no text layer (candidates for OCR).
+
+    Tiny images (logos, signatures) below min_area_ratio of the page are skipped.
+    """
+    page_area = abs(page.rect)
+    regions = []
+    for info in page.get_image_info():
+        rect = fitz.Rect(info["bbox"]) & page.rect
+        if rect.is_empty or abs(rect) < min_area_ratio * page_area:
+            continue
+        # a text layer over the image (searchable scan) means it is already covered
+        if any(fitz.Point((w[0] + w[2]) / 2, (w[1] + w[3]) / 2) in rect for w in words):
+            continue
+        regions.append(rect)
+    return regions
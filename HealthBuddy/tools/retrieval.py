@@ -0,0 +1,86 @@
+import math
+import re
+from collections import Counter
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+K1 = 1.5
+B = 0.75
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower().replace("_", " "))
+
+
+def analyte_snippet(timestamp, analyte, info):
+    """One searchable line per test result."""
+    parts = [timestamp[:10], analyte.replace("_", " "), str(info.get("value", "")), info.get("unit") or ""]
+    if info.get("flag"):
+        parts.append(info["flag"])
+    if info.get("reference_range"):
+        parts.append(f"(ref {info['reference_range']})")
+    return " ".join(p for p in parts if p)
+
+
+def index_document(conn, patient_id, source, timestamp, text):
+    """Add one snippet to the patient's inverted index (postings + doc stats).
+
+    Called inside the store's write transaction, so indexing is
+    incremental: only the new document's terms are touched.
+    """
+    terms = Counter(tokenize(text))
+    if not terms:
+        return
+    cur = conn.execute(
+        "INSERT INTO retrieval_docs (patient_id, source, timestamp, text, length) VALUES (?, ?, ?, ?, ?)",
+        (patient_id, source, timestamp, text, sum(terms.values())),
+    )
+    doc_id = cur.lastrowid
+    conn.executemany(
+        "INSERT INTO retrieval_postings (patient_id, term, doc_id, tf) VALUES (?, ?, ?, ?)",
+        [(patient_id, term, doc_id, tf) for term, tf in terms.items()],
+    )
+
+
+def search(conn, patient_id, query, k=8, extra_terms=()):
+    """Top-k BM25 snippets for a query over one patient's documents.
+
+    Returns [{"text", "source", "timestamp", "score"}], best first.
+    """
+    terms = set(tokenize(query)) | set(extra_terms)
+    if not terms:
+        return []
+    n_docs, total_len = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM retrieval_docs WHERE patient_id = ?",
+        (patient_id,),
+    ).fetchone()
+    if not n_docs:
+        return []
+    avgdl = total_len / n_docs
+
+    marks = ",".join("?" * len(terms))
+    postings = conn.execute(
+        f"SELECT p.term, p.doc_id, p.tf, d.length FROM retrieval_postings p "
+        f"JOIN retrieval_docs d ON d.id = p.doc_id "
+        f"WHERE p.patient_id = ? AND p.term IN ({marks})",
+        (patient_id, *terms),
+    ).fetchall()
+
+    df = Counter(row[0] for row in postings)
+    scores = Counter()
+    for term, doc_id, tf, length in postings:
+        idf = math.log(1 + (n_docs - df[term] + 0.5) / (df[term] + 0.5))
+        scores[doc_id] += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avgdl))
+
+    top = scores.most_common(k)
+    if not top:
+        return []
+    ids = [doc_id for doc_id, _ in top]
+    rows = conn.execute(
+        f"SELECT id, text, source, timestamp FROM retrieval_docs WHERE id IN ({','.join('?' * len(ids))})",
+        ids,
+    ).fetchall()
+    by_id = {r[0]: r for r in rows}
+    return [
+        {"text": by_id[d][1], "source": by_id[d][2], "timestamp": by_id[d][3], "score": s}
+        for d, s in top
+    ]
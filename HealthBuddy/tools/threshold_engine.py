@@ -0,0 +1,139 @@
+from tools.lazy_import import lazy_import
+
+np = lazy_import("numpy")  # only the vectorised re-flagging needs it
+
+# Some simple clinical thresholds (example). These are illustrative, not exhaustive.
+THRESHOLDS = {
+    "hemoglobin": {"low": 12.0, "high": 18.0, "unit":"g/dL"},
+    "wbc": {"low": 4000, "high": 11000, "unit": "cells/uL"},
+    "platelets": {"low": 150000, "high": 450000, "unit": "cells/uL"},
+    "creatinine": {"low": 0.6, "high": 1.3, "unit":"mg/dL"},
+    "tsh": {"low": 0.4, "high": 4.0, "unit":"µIU/mL"},
+    "fbs": {"low": 70, "high": 99, "unit":"mg/dL"},
+    "ppbs": {"low": 70, "high": 140, "unit":"mg/dL"},
+    "hba1c": {"low": 4.0, "high": 5.6, "unit":"%"},
+    "amh": {"low": 0.5, "high": 3.5, "unit":"ng/mL"},
+    "fs h": {"low": 1.0, "high": 15.0, "unit":""},
+    "fsh": {"low": 1.0, "high": 15.0, "unit":""},
+    # add more as needed
+}
+
+# Demographic-specific ranges; used instead of THRESHOLDS when sex/age match.
+# age_min inclusive, age_max exclusive; None = unbounded.
+DEMOGRAPHIC_RANGES = [
+    {"analyte": "hemoglobin", "sex": "F", "age_min": 18, "age_max": None, "low": 12.0, "high": 15.5},
+    {"analyte": "hemoglobin", "sex": "M", "age_min": 18, "age_max": None, "low": 13.5, "high": 17.5},
+]
+
+
+class ThresholdEngine:
+    """Resolves analyte names to reference ranges and classifies values.
+
+    Key resolution (exact name first, then the first THRESHOLDS entry
+    contained in the key) is done once per distinct key and memoized.
+    classify_many/classify_table work on whole NumPy arrays, so a full
+    history or cohort is re-flagged without a Python loop per value.
+    """
+
+    def __init__(self, thresholds=THRESHOLDS, demographic_ranges=DEMOGRAPHIC_RANGES):
+        self.thresholds = thresholds
+        self.demographic_ranges = {}
+        for row in demographic_ranges:
+            self.demographic_ranges.setdefault(row["analyte"], []).append(row)
+        self._resolved = {}
+
+    def resolve(self, key):
+        """Canonical THRESHOLDS name for a parsed key, or None."""
+        k = key.lower()
+        if k not in self._resolved:
+            if k in self.thresholds:
+                self._resolved[k] = k
+            else:
+                self._resolved[k] = next((tk for tk in self.thresholds if tk in k), None)
+        return self._resolved[k]
+
+    def bounds(self, key, sex=None, age=None):
+        """(low, high) for a key, most specific demographic match first; None if unknown."""
+        name = self.resolve(key)
+        if name is None:
+            return None
+        for row in self.demographic_ranges.get(name, []):
+            if row["sex"] is not None and (sex is None or row["sex"] != sex.upper()[:1]):
+                continue
+            if age is None and (row["age_min"] is not None or row["age_max"] is not None):
+                continue
+            if row["age_min"] is not None and age < row["age_min"]:
+                continue
+            if row["age_max"] is not None and age >= row["age_max"]:
+                continue
+            return row["low"], row["high"]
+        t = self.thresholds[name]
+        return t["low"], t["high"]
+
+    def classify(self, key, value, sex=None, age=None):
+        """'Low' / 'High' / 'Normal', or '' when there is no range for the key."""
+        b = self.bounds(key, sex, age)
+        if b is None or value is None:
+            return ""
+        low, high = b
+        if value < low:
+            return "Low"
+        if value > high:
+            return "High"
+        return "Normal"
+
+    @staticmethod
+    def _label(values, lows, highs):
+        values = np.asarray(values, dtype=float)
+        out = np.where(values < lows, "Low", np.where(values > highs, "High", "Normal"))
+        # NaN values (missing) and NaN bounds (unknown analyte) -> ""
+        return np.where(np.isnan(values) | np.isnan(lows) | np.isnan(highs), "", out)
+
+    def classify_many(self, key, values, sex=None, age=None):
+        """Classify an array of values of one analyte at once."""
+        low, high = self.bounds(key, sex, age) or (np.nan, np.nan)
+        return self._label(values, low, high)
+
+    def classify_table(self, keys, values, sexes=None, ages=None):
+        """Classify parallel arrays of (analyte, value[, sex, age]) rows.
+
+        Ranges are looked up once per distinct (analyte, sex, age) combo and
+        broadcast back to the rows; the comparison itself is vectorized.
+        """
+        n = len(keys)
+        if sexes is None and ages is None:
+            uniq, inverse = np.unique(np.asarray(keys, dtype=str), return_inverse=True)
+            combo_index = {(str(k), None, None): j for j, k in enumerate(uniq)}
+        else:
+            sexes = [None] * n if sexes is None else sexes
+            ages = [None] * n if ages is None else ages
+            combo_index = {}
+            inverse = np.empty(n, dtype=np.int64)
+            for i, combo in enumerate(zip(keys, sexes, ages)):
+                inverse[i] = combo_index.setdefault(combo, len(combo_index))
+
+        table = np.full((len(combo_index), 2), np.nan)
+        for (key, sex, age), j in combo_index.items():
+            b = self.bounds(key, sex, age)
+            if b is not None:
+                table[j] = b
+        return self._label(values, table[inverse, 0], table[inverse, 1])
+
+    def reflag(self, store, patient_id=None, sex=None, age=None):
+        """Re-classify stored values against the current ranges.
+
+        patient_id=None re-flags the whole store (cohort). Returns
+        [{"patient_id", "analyte", "timestamp", "value", "status"}].
+        """
+        rows = store.analyte_rows(patient_id)
+        if not rows:
+            return []
+        keys = [r["analyte"] for r in rows]
+        values = np.array([np.nan if r["value"] is None else r["value"] for r in rows])
+        if sex is None and age is None:
+            labels = self.classify_table(keys, values)
+        else:
+            labels = self.classify_table(keys, values, [sex] * len(rows), [age] * len(rows))
+        return [{**r, "status": str(s)} for r, s in zip(rows, labels)]
+
+threshold_engine = ThresholdEngine()
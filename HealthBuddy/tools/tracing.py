@@ -0,0 +1,296 @@
+import atexit
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_current = contextvars.ContextVar("healthbuddy_span", default=None)
+_active_iter = contextvars.ContextVar("healthbuddy_timed_iter", default=None)
+
+
+class Span:
+    """One timed stage. Children are attached to their parent as they start."""
+
+    def __init__(self, tracer, name, parent=None, **attrs):
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.children = []
+        self.error = None
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+        if parent is not None:
+            parent.children.append(self)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def record(self, name, seconds, **attrs):
+        """Attach an already-measured child (e.g. timed in a worker process)."""
+        child = Span(self.tracer, name, self, **attrs)
+        child.finish(seconds)
+        return child
+
+    def finish(self, duration=None):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._start if duration is None else duration
+            self.tracer._finished(self)
+
+    def to_dict(self):
+        children = [c.to_dict() for c in self.children if c.duration is not None]
+        return {
+            "name": self.name,
+            "start": self.start_time,
+            "seconds": self.duration,
+            "self_seconds": max(0.0, (self.duration or 0.0) - sum(c["seconds"] for c in children)),
+            "attrs": self.attrs,
+            "error": self.error,
+            "children": children,
+        }
+
+
+class TimedIter:
+    """Iterator wrapper timing only the work of producing items.
+
+    While an item is being produced the span is the current one, so spans
+    opened by the producer nest under it; time spent in a nested TimedIter
+    (e.g. the OCR pages a parser pulls) is not counted twice. The span is
+    finished when the iterator is exhausted or closed.
+    """
+
+    def __init__(self, iterable, span):
+        self._it = iter(iterable)
+        self.span = span
+        self.items = 0
+        self._busy = 0.0
+        self._nested = 0.0
+        self._first = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        outer = _active_iter.get()
+        span_token, iter_token = _current.set(self.span), _active_iter.set(self)
+        start = time.perf_counter()
+        try:
+            item, failure = next(self._it), None
+        except BaseException as e:  # StopIteration included: finish the span below
+            failure = e
+        finally:
+            elapsed = time.perf_counter() - start
+            self._busy += elapsed
+            if outer is not None:
+                outer._nested += elapsed
+            _active_iter.reset(iter_token)
+            _current.reset(span_token)
+        if failure is not None:
+            if not isinstance(failure, StopIteration):
+                self.span.error = type(failure).__name__
+            self.close()
+            raise failure
+        self.items += 1
+        if self._first is None:
+            self._first = self._busy
+        return item
+
+    def close(self):
+        close = getattr(self._it, "close", None)
+        if close:
+            close()
+        if self.span.duration is None:
+            self.span.set(items=self.items, first_item_seconds=self._first)
+            self.span.finish(self._busy - self._nested)
+
+
+class Tracer:
+    """Spans, counters and histograms for the whole app (one per process).
+
+    Spans nest through a context variable, so a stage only needs
+    `with tracer.span("ocr"):` to show up under whatever request is
+    running. Every finished span is observed in the
+    healthbuddy_span_seconds histogram; finished root spans (one per
+    request: job, chat, action) are kept for the diagnostics panel, and
+    written to metrics.prom / traces.json when `export_dir` is set -- by a
+    background thread, at most once per `export_interval` seconds, so
+    requests never wait on the files.
+    """
+
+    def __init__(self, max_traces=50, export_dir=None, export_interval=5.0):
+        self.traces = deque(maxlen=max_traces)
+        self.export_dir = export_dir
+        self.export_interval = export_interval
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._exporter = None
+
+    ###########################
+    # Spans
+    ###########################
+    def current(self):
+        return _current.get()
+
+    def start_span(self, name, parent=None, **attrs):
+        """A span that is not made current; call .finish() yourself (generators)."""
+        return Span(self, name, parent if parent is not None else _current.get(), **attrs)
+
+    def span(self, name, parent=None, **attrs):
+        return _SpanContext(self, name, parent, attrs)
+
+    def traced(self, name):
+        """Decorator: run the function inside a span."""
+        def wrap(fn):
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return inner
+        return wrap
+
+    def iter_span(self, name, iterable, parent=None, **attrs):
+        return TimedIter(iterable, self.start_span(name, parent, **attrs))
+
+    def record(self, name, seconds, **attrs):
+        """Attach a measured child to the current span (or just observe it)."""
+        parent = _current.get()
+        if parent is not None:
+            return parent.record(name, seconds, **attrs)
+        self.observe("healthbuddy_span_seconds", seconds, span=name)
+
+    def annotate(self, **attrs):
+        span = _current.get()
+        if span is not None:
+            span.set(**attrs)
+
+    def _finished(self, span):
+        self.observe("healthbuddy_span_seconds", span.duration, span=span.name)
+        if span.error:
+            self.count("healthbuddy_span_errors_total", span=span.name)
+        if span.parent is None:
+            with self._lock:
+                self.traces.append(span)
+            if self.export_dir:
+                self._schedule_export()
+
+    def recent(self, n=10):
+        """Last n finished requests, newest first, as nested dicts."""
+        with self._lock:
+            spans = list(self.traces)[-n:]
+        return [s.to_dict() for s in reversed(spans)]
+
+    ###########################
+    # Metrics
+    ###########################
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def count(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    h[i] += 1
+            h[len(BUCKETS)] += 1
+            h[-1] += value
+
+    def to_prometheus(self):
+        def fmt(labels, extra=()):
+            items = [f'{k}="{v}"' for k, v in (*labels, *extra)]
+            return "{" + ",".join(items) + "}" if items else ""
+
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((k, list(v)) for k, v in self.histograms.items())
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{fmt(labels)} {value}")
+        for (name, labels), h in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, n in zip(BUCKETS, h):
+                lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {n}")
+            lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {h[len(BUCKETS)]}")
+            lines.append(f"{name}_sum{fmt(labels)} {h[-1]}")
+            lines.append(f"{name}_count{fmt(labels)} {h[len(BUCKETS)]}")
+        return "\n".join(lines) + "\n"
+
+    def _schedule_export(self):
+        self._dirty.set()
+        if self._exporter is None:
+            with self._lock:
+                if self._exporter is None:
+                    self._exporter = threading.Thread(target=self._export_loop, name="tracer-export", daemon=True)
+                    self._exporter.start()
+                    atexit.register(self._flush)
+
+    def _export_loop(self):
+        while True:
+            self._dirty.wait()
+            self._flush()
+            time.sleep(self.export_interval)
+
+    def _flush(self):
+        if self._dirty.is_set() and self.export_dir:
+            self._dirty.clear()
+            try:
+                self.export()
+            except OSError:
+                pass  # metrics files are best effort
+
+    def export(self, export_dir=None):
+        """Write metrics.prom (Prometheus text) and traces.json (recent requests)."""
+        export_dir = export_dir or self.export_dir
+        os.makedirs(export_dir, exist_ok=True)
+        files = {
+            "metrics.prom": self.to_prometheus(),
+            "traces.json": json.dumps(self.recent(self.traces.maxlen), indent=1, default=str),
+        }
+        for name, text in files.items():
+            path = os.path.join(export_dir, name)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, path)
+
+
+class _SpanContext:
+    def __init__(self, tracer, name, parent, attrs):
+        self.tracer, self.name, self.parent, self.attrs = tracer, name, parent, attrs
+
+    def __enter__(self):
+        self.span = self.tracer.start_span(self.name, self.parent, **self.attrs)
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self.token)
+        if exc_type is not None:
+            self.span.error = exc_type.__name__
+        self.span.finish()
+        return False
+
+
+tracer = Tracer()
@@ -0,0 +1,82 @@
+from datetime import datetime
+
+EWMA_ALPHA = 0.3        # weight of the newest value in the rolling mean
+ALERT_CHANGE = 0.20     # |relative change| vs previous value that raises an alert
+
+
+def _days(timestamp):
+    return datetime.fromisoformat(timestamp).timestamp() / 86400.0
+
+
+def update_trend(conn, patient_id, analyte, value, timestamp):
+    """Fold one new value into the analyte_trends row (O(1), no history scan).
+
+    Keeps count/min/max, an exponentially weighted rolling mean, the last
+    two values, and running sums for a least-squares slope. Values older
+    than the current last one (backfills) only update the order-free
+    aggregates.
+    """
+    if value is None:
+        return
+    days = _days(timestamp)
+    row = conn.execute(
+        "SELECT * FROM analyte_trends WHERE patient_id = ? AND analyte = ?",
+        (patient_id, analyte),
+    ).fetchone()
+
+    if row is None:
+        # t is measured from the first observation to keep the sums well conditioned
+        conn.execute(
+            "INSERT INTO analyte_trends (patient_id, analyte, count, last_value, last_ts, "
+            "prev_value, prev_ts, mean, min_value, max_value, t0, sum_t, sum_v, sum_tt, sum_tv) "
+            "VALUES (?, ?, 1, ?, ?, NULL, NULL, ?, ?, ?, ?, 0, ?, 0, 0)",
+            (patient_id, analyte, value, timestamp, value, value, value, days, value),
+        )
+        return
+
+    t = days - row["t0"]
+    last_value, last_ts = row["last_value"], row["last_ts"]
+    prev_value, prev_ts, mean = row["prev_value"], row["prev_ts"], row["mean"]
+    if timestamp >= last_ts:
+        prev_value, prev_ts = last_value, last_ts
+        last_value, last_ts = value, timestamp
+        mean = EWMA_ALPHA * value + (1 - EWMA_ALPHA) * mean
+
+    conn.execute(
+        "UPDATE analyte_trends SET count = count + 1, last_value = ?, last_ts = ?, "
+        "prev_value = ?, prev_ts = ?, mean = ?, min_value = MIN(min_value, ?), "
+        "max_value = MAX(max_value, ?), sum_t = sum_t + ?, sum_v = sum_v + ?, "
+        "sum_tt = sum_tt + ?, sum_tv = sum_tv + ? WHERE patient_id = ? AND analyte = ?",
+        (last_value, last_ts, prev_value, prev_ts, mean, value, value,
+         t, value, t * t, t * value, patient_id, analyte),
+    )
+
+
+def trend_record(row, alert_change=ALERT_CHANGE):
+    """Public view of an analyte_trends row, with slope (per day) and alert."""
+    n = row["count"]
+    denom = n * row["sum_tt"] - row["sum_t"] ** 2
+    # timestamps within the same upload batch give denom ~ 0 -> no slope
+    slope = (n * row["sum_tv"] - row["sum_t"] * row["sum_v"]) / denom if n > 1 and abs(denom) > 1e-9 else None
+
+    change = None
+    if row["prev_value"] not in (None, 0):
+        change = (row["last_value"] - row["prev_value"]) / abs(row["prev_value"])
+    alert = ""
+    if change is not None and abs(change) >= alert_change:
+        direction = "up" if change > 0 else "down"
+        alert = f"{row['analyte'].upper()} {direction} {abs(change) * 100:.0f}% since {row['prev_ts'][:10]}"
+
+    return {
+        "analyte": row["analyte"],
+        "count": n,
+        "last": row["last_value"],
+        "last_timestamp": row["last_ts"],
+        "previous": row["prev_value"],
+        "rolling_mean": row["mean"],
+        "min": row["min_value"],
+        "max": row["max_value"],
+        "slope_per_day": slope,
+        "change": change,
+        "alert": alert,
+    }